@@ -0,0 +1,305 @@
+# benchmarks of the hot paths on synthetic inputs (input_data/generate_inputs.py), runs offline
+# everything runs in a temporary copy of the forms so nothing in the repo is touched
+# results (latency, throughput, peak memory) are saved as json to compare between commits:
+#   python benchmark.py --trades 10 1000 100000
+#   python benchmark.py --compare benchmark_results/old.json benchmark_results/new.json
+import os
+import sys
+import glob
+import json
+import time
+import math
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import contextlib
+from itertools import product
+import logging
+
+import key_matcher
+import fill_keys
+import fill_taxes
+from fill_taxes import fill_taxes_by_year, gather_inputs
+from utils.forms_utils import fill_pdf_from_keys, load_keys, template_cache
+from utils.forms_constants import logger, forms_folder, fields_spec_folder, keymap_extension, pdf_extension, \
+    json_extension, index_extension, build_cache_folder
+from utils.form_worksheet_names import k_8949
+from input_data.parse_data import parse_1099_xml, parse_1099_csv, logger as input_logger
+from input_data.generate_inputs import write_input, wage_range as default_wage_range
+
+benchmark_results_folder = "benchmark_results"
+repo_folder = os.path.dirname(os.path.abspath(__file__))
+trades_per_page = 14
+
+cases = [
+    'fill_taxes', 'fill_pdf_from_keys', 'load_keys', 'process_pdf', 'build_key_maps',
+    'parse_1099_xml', 'parse_1099_csv', 'fill_taxes_main',
+]
+
+
+# synthetic data
+
+def write_1099_xml(path, data_1099):
+    def xml_date(u):  # MM/DD/YYYY to YYYYMMDD
+        return u[6:] + u[:2] + u[3:5]
+
+    def xml_trade(t):
+        wash = f"<WASHSALELOSSDISALLOWED>{t['WashSaleValue']:.2f}</WASHSALELOSSDISALLOWED>" \
+            if t['WashSaleValue'] else ""
+        return (
+            f"<TRADE><SALEDESCRIPTION>{t['SalesDescription']}</SALEDESCRIPTION>"
+            f"<DTAQD>{xml_date(t['DateAcquired'])}</DTAQD><DTSALE>{xml_date(t['DateSold'])}</DTSALE>"
+            f"<SALESPR>{t['Proceeds']:.2f}</SALESPR><COSTBASIS>{t['Cost']:.2f}</COSTBASIS>"
+            f"<NUMSHRS>{t['Shares']}</NUMSHRS>"
+            f"<SECNAME>{t['SalesDescription']}</SECNAME><LONGSHORT>{t['LongShort']}</LONGSHORT>"
+            f"<FORM8949CODE>{t['FormCode']}</FORM8949CODE>{wash}</TRADE>"
+        )
+    trades = "".join(xml_trade(t) for t in data_1099['Trades'])
+    with open(path, 'w') as f:
+        f.write(
+            "<OFX><TAX1099MSGSRSV1><TAX1099TRNRS><TAX1099RS>"
+            f"<TAX1099INFO><FINAME_DIRECTDEPOSIT>{data_1099['Institution']}</FINAME_DIRECTDEPOSIT></TAX1099INFO>"
+            f"<TAX1099DIV><ORDDIV>{data_1099['Ordinary Dividends']:.2f}</ORDDIV>"
+            f"<QUALIFIEDDIV>{data_1099['Qualified Dividends']:.2f}</QUALIFIEDDIV><FORTAXPD>0</FORTAXPD></TAX1099DIV>"
+            f"<TAX1099INT><INTINCOME>{data_1099['Interest']:.2f}</INTINCOME></TAX1099INT>"
+            f"<TAX1099B_V100><EXTDBINFO_V100>\n{trades}</EXTDBINFO_V100></TAX1099B_V100>"
+            "</TAX1099RS></TAX1099TRNRS></TAX1099MSGSRSV1></OFX>"
+        )
+
+
+def write_1099_csv(path, data_1099):
+    # header rows first (row 0 summary, row 1 trades), then values, rows padded to the same width
+    summary_header = ["1099-DIV-1A Total Ordinary Dividends", "1099-DIV-1B Qualified Dividends",
+                      "1099-INT-1 Interest Income"]
+    summary = [data_1099['Ordinary Dividends'], data_1099['Qualified Dividends'], data_1099['Interest']]
+    trade_header = ["1099-B-1a Description of property Stock or Other symbol CUSIP ", "Quantity",
+                    "1099-B-1b Date Acquired", "1099-B-1c Date Sold or Disposed", "1099-B-1d Proceeds",
+                    "1099-B-1e Cost or Other Basis", "1099-B-1g-Wash sale loss Disallowed", "Term",
+                    "Covered/Uncovered"]
+    width = 1 + max(len(summary_header), len(trade_header))
+
+    def row(name, values):
+        values = [str(v) for v in values]
+        return ",".join([name] + values + [""] * (width - 1 - len(values))) + "\n"
+    with open(path, 'w') as f:
+        f.write(row("1099 Summary          ", summary_header))
+        f.write(row("1099-B-Detail                           ", trade_header))
+        f.write(row("1099 Summary          ", summary))
+        for t in data_1099['Trades']:
+            f.write(row("1099-B-Detail                           ", [
+                t['SalesDescription'], t['Shares'], t['DateAcquired'], t['DateSold'],
+                f"{t['Proceeds']:.2f}", f"{t['Cost']:.2f}", f"{t['WashSaleValue']:.2f}", t['LongShort'] + " TERM",
+                "COVERED" if t['FormCode'] in "AD" else "UNCOVERED",
+            ]))
+
+
+# measurements
+
+def measure(function, repeat, memory, setup=None):
+    # best latency over repeat runs, then one more run under tracemalloc for the peak memory
+    # setup runs before each run, out of the timing
+    latency = math.inf
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        latency = min(latency, time.perf_counter() - start)
+    peak = None
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return latency, peak
+
+
+def run_case(results, case, params, items, function, repeat, memory, setup=None):
+    record = dict(case=case, params=params, items=items)
+    try:
+        latency, peak = measure(function, repeat, memory, setup)
+        record.update(latency_s=latency, throughput_per_s=items / latency if latency else None,
+                      peak_memory_bytes=peak)
+        print(f"{case:<22} {json.dumps(params):<50} {latency * 1e3:>12.3f} ms {items / latency:>14.1f} /s"
+              + (f" {peak / 2 ** 20:>10.1f} MiB" if peak is not None else ""))
+    except Exception as e:
+        record.update(error=f"{type(e).__name__}: {e}")
+        print(f"{case:<22} {json.dumps(params):<50} failed -- {record['error']}")
+    results.append(record)
+
+
+@contextlib.contextmanager
+def workspace(years):
+    # temporary working directory with a copy of the blank forms and field specs, key maps are generated there
+    previous = os.getcwd()
+    folder = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        for year in years:
+            for u in glob.glob(os.path.join(repo_folder, forms_folder, year, "*", "f*" + pdf_extension)):
+                target = os.path.join(folder, os.path.relpath(u, repo_folder))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy(u, target)
+        shutil.copytree(os.path.join(repo_folder, fields_spec_folder), os.path.join(folder, fields_spec_folder))
+        os.chdir(folder)
+        yield folder
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def cold_key_maps(year):
+    # no parsed form in the template cache (the forked workers would inherit it), no key map, index or build cache
+    template_cache.clear()
+    fill_keys.fields_specs.clear()
+    for extension in (keymap_extension, index_extension):
+        for u in glob.glob(os.path.join(forms_folder, year, "*", "*" + extension)):
+            os.remove(u)
+    shutil.rmtree(build_cache_folder, ignore_errors=True)
+
+
+def build_keys(year):
+    fill_keys.year_folder = year
+    fill_keys.main()
+
+
+def benchmark(selected, sizes_w2, sizes_1099, sizes_trades, repeat, memory, year="2023",
+              wage_range=default_wage_range):
+    results = []
+    grid = list(product(sizes_w2, sizes_1099, sizes_trades))
+    with workspace([year]):
+        if 'process_pdf' in selected:
+            key_matcher.year_folder = year
+            key_matcher.map_folders(key_matcher.key_mapping_folder, year)
+            for u in sorted(glob.glob(os.path.join(forms_folder, year, "*", "f*" + pdf_extension))):
+                run_case(results, 'process_pdf', dict(form=os.path.relpath(u, forms_folder)), 1,
+                         lambda u=u: key_matcher.process_pdf(u), repeat, memory)
+        if 'build_key_maps' in selected:
+            n_forms = len(glob.glob(os.path.join(forms_folder, year, "*", "f*" + pdf_extension)))
+            run_case(results, 'build_key_maps', dict(years=[year], workers=os.cpu_count()), n_forms,
+                     lambda: fill_keys.build_years([year]), repeat, memory, setup=lambda: cold_key_maps(year))
+
+        if {'load_keys', 'fill_pdf_from_keys', 'fill_taxes_main'} & set(selected):
+            build_keys(year)
+        keys_files = sorted(glob.glob(os.path.join(forms_folder, year, "*", "*" + keymap_extension)))
+        if 'load_keys' in selected:
+            for u in keys_files:
+                run_case(results, 'load_keys', dict(form=os.path.relpath(u, forms_folder)), 1,
+                         lambda u=u: load_keys(u), repeat, memory)
+
+        for n_w2, n_1099, n_trades in grid:
+            params = dict(w2=n_w2, forms_1099=n_1099, trades=n_trades)
+            if tuple(wage_range) != tuple(default_wage_range):
+                params['wage_range'] = list(wage_range)  # default left out, results stay comparable
+            write_input(os.path.join("input_data", year, "input" + json_extension), n_w2, n_1099, n_trades,
+                        wage_range=tuple(wage_range))
+            data = gather_inputs(year)
+            data['transaction'] = []  # 2021 engine
+
+            if 'fill_taxes' in selected:
+                # each year gets the output of the previous one, like fill_taxes_chain (2019 and 2020 need it)
+                outputs = {}
+                previous = None
+                for y, fill in fill_taxes_by_year.items():
+                    def fill_year(y=y, fill=fill, previous=previous):
+                        outputs[y] = fill(data) if y == "2018" else fill(data, previous)
+                    run_case(results, 'fill_taxes_' + y, params, n_trades or 1, fill_year, repeat, memory)
+                    previous = outputs[y][:2] if y in outputs else None
+
+            if 'fill_pdf_from_keys' in selected:
+                pages = max(1, math.ceil(n_trades / trades_per_page))
+                template = os.path.join(forms_folder, year, k_8949 + pdf_extension)
+                d_mapping = load_keys(os.path.join(forms_folder, year, k_8949 + keymap_extension))
+                d = {k: (True if t == '/Btn' else 12345.67) for k, (_, t) in d_mapping.items()}
+
+                def fill_pages():
+                    for i in range(pages):
+                        fill_pdf_from_keys(file=template, out_file=f"f8949_{i}{pdf_extension}", d=d)
+                run_case(results, 'fill_pdf_from_keys', dict(params, pages=pages), pages, fill_pages, repeat, memory)
+
+            if 'parse_1099_xml' in selected or 'parse_1099_csv' in selected:
+                # one broker with all the detailed trades, brokers export no aggregated line
+                one_1099 = dict(data['1099'][0], Trades=[
+                    t for f in data['1099'] for t in f['Trades'] if t['SalesDescription'] != "Aggregated"])
+                write_1099_xml("1099.xml", one_1099)
+                write_1099_csv("1099.csv", one_1099)
+                if 'parse_1099_xml' in selected:
+                    run_case(results, 'parse_1099_xml', params, n_trades or 1,
+                             lambda: parse_1099_xml("1099.xml"), repeat, memory)
+                if 'parse_1099_csv' in selected:
+                    run_case(results, 'parse_1099_csv', params, n_trades or 1,
+                             lambda: parse_1099_csv("1099.csv"), repeat, memory)
+
+            if 'fill_taxes_main' in selected:
+                run_case(results, 'fill_taxes_main', params, 1, fill_taxes.main, repeat, memory)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo_folder,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_file, new_file):
+    with open(old_file) as f:
+        old = {(r['case'], json.dumps(r['params'])): r for r in json.load(f)['results']}
+    with open(new_file) as f:
+        new = json.load(f)['results']
+    for r in new:
+        o = old.get((r['case'], json.dumps(r['params'])))
+        if o is None or 'latency_s' not in o or 'latency_s' not in r:
+            continue
+        print(f"{r['case']:<22} {json.dumps(r['params']):<50} "
+              f"{o['latency_s'] * 1e3:>12.3f} ms -> {r['latency_s'] * 1e3:>12.3f} ms "
+              f"x{o['latency_s'] / r['latency_s']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks on synthetic inputs")
+    parser.add_argument('--cases', nargs='+', default=cases, choices=cases)
+    parser.add_argument('--w2', nargs='+', type=int, default=[1])
+    parser.add_argument('--forms-1099', nargs='+', type=int, default=[1])
+    parser.add_argument('--trades', nargs='+', type=int, default=[10, 1_000])
+    parser.add_argument('--wage-range', nargs=2, type=float, default=default_wage_range, metavar=('LOW', 'HIGH'),
+                        help="wages of each W2, below 100000 for the Tax Table")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run")
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # the per-file info logs would be most of what is measured
+    for one_logger in [logger, fill_taxes.logger, input_logger]:
+        one_logger.setLevel(logging.WARNING)
+
+    commit = git_commit()
+    results = benchmark(args.cases, args.w2, args.forms_1099, args.trades, args.repeat, not args.no_memory,
+                        wage_range=args.wage_range)
+    out = args.out or os.path.join(benchmark_results_folder,
+                                   (commit or time.strftime("%Y%m%d_%H%M%S")) + json_extension)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'time': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'python': sys.version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'results': results,
+        }, f, indent=4)
+    print("Results saved to", out)
+
+
+if __name__ == "__main__":
+    main()
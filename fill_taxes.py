@@ -1,8 +1,17 @@
 import os
+import sys
+import glob
 import json
+import time
+import hashlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from utils.forms_constants import *
-from utils.forms_utils import fill_pdf_from_keys, logging, process_logger, map_folders, load_keys, output_pdf_folder
-from pdfrw import PdfReader, PdfWriter
+from utils.forms_utils import fill_pdf, fill_pdf_pages, fill_pdf_from_keys, write_pdf, merge_forms, logging, \
+    process_logger, map_folders, load_inverse_keys, output_pdf_folder
+from utils.forms_slim import template_path
+from utils.forms_fdf import form_values, form_pages_values, top_names, merge_values, field_writers
+from utils.forms_incremental import UpdatedPdfReader
 from utils.user_interface import update_dict
 from utils.forms_core_2018 import fill_taxes_2018
 from utils.forms_core_2019 import fill_taxes_2019
@@ -15,37 +24,126 @@ from utils.forms_core_2023 import fill_taxes_2023
 logger = logging.getLogger('fill_taxes')
 process_logger(logger, file_name='fill_taxes')
 
+fill_taxes_by_year = {
+    "2018": fill_taxes_2018,
+    "2019": fill_taxes_2019,
+    "2020": fill_taxes_2020,
+    "2021": fill_taxes_2021,
+    "2022": fill_taxes_2022,
+    "2023": fill_taxes_2023,
+}
+chain_cache_version = "1"  # bump to drop every cached year
 
-def fill_pdfs(forms_state, forms_year_folder):
-    map_folders(output_pdf_folder, forms_year_folder)
+
+def fill_one_pdf(args, flatten=False, incremental=False):
+    # top level for the process pool
+    file, out_file, d = args
+    if isinstance(d, list):
+        write_pdf(out_file, fill_pdf_pages(file, d, flatten))
+    else:
+        fill_pdf_from_keys(file, out_file, d, flatten, incremental)
+
+
+def pdf_tasks(forms_state, forms_year_folder, combine_pages=False):
+    # (template, output file, fields) for every Federal form, and every page of list states like f8949
+    # combine_pages makes one task for a list state, with the list of fields, filled as one document
+    # the template is the slimmed copy of the form when slim_forms.py made one
     form_year_folder = os.path.join(forms_folder, forms_year_folder)
     output_year_folder = os.path.join(output_pdf_folder, forms_year_folder)
 
-    all_out_files = []
+    tasks = []
     for f, d_contents in forms_state.items():
         if not f.startswith("Federal"):
             continue
-        d_mapping = load_keys(os.path.join(form_year_folder, f + keys_extension))
-
-        def fill_one_pdf(contents, suffix=""):
-            ddd = {k: contents[val[0]] for k, val in d_mapping.items() if val[0] in contents}
-            outfile = os.path.join(output_year_folder, f + suffix + pdf_extension)
-            all_out_files.append(outfile)
-            fill_pdf_from_keys(file=os.path.join(form_year_folder, f + pdf_extension),
-                               out_file=outfile, d=ddd)
-        if isinstance(d_contents, list):
+        inverse_mapping = load_inverse_keys(os.path.join(form_year_folder, f + keymap_extension))
+        template = template_path(os.path.join(form_year_folder, f + pdf_extension))
+
+        def fields(contents):
+            # only the values set by the engine are looked up, not every field of the form
+            return {k: value for name, value in contents.items() for k in inverse_mapping.get(name, ())}
+
+        def out_file(suffix=""):
+            return os.path.join(output_year_folder, f + suffix + pdf_extension)
+        if isinstance(d_contents, list) and combine_pages:
+            tasks.append((template, out_file(), [fields(one_content) for one_content in d_contents]))
+        elif isinstance(d_contents, list):
             for i, one_content in enumerate(d_contents):
-                fill_one_pdf(one_content, "_" + str(i))
+                tasks.append((template, out_file("_" + str(i)), fields(one_content)))
         elif isinstance(d_contents, dict):
-            fill_one_pdf(d_contents)
-    return all_out_files
+            tasks.append((template, out_file(), fields(d_contents)))
+    return tasks
+
+
+def export_fields(tasks, forms_year_folder, output_format, combine_forms=False):
+    # field values only, one file per form (f1040.fdf next to where f1040.pdf goes) that references its blank form
+    # combine_forms writes one file for the return, with the field names of the merged pdf (fill_and_merge_pdfs)
+    write = field_writers[output_format]
+    documents = []
+    out_files = []
+    for template, outfile, ddd in tasks:
+        values = form_pages_values(template, ddd) if isinstance(ddd, list) else form_values(template, ddd)
+        out_file = os.path.splitext(outfile)[0] + output_format
+        if combine_forms:
+            pages = len(ddd) if isinstance(ddd, list) else None
+            documents.append((os.path.splitext(os.path.basename(outfile))[0], values, top_names(template, pages)))
+        else:
+            write(out_file, values, os.path.relpath(template, os.path.dirname(out_file)))
+            out_files.append(out_file)
+    if combine_forms:
+        out_file = os.path.join(output_pdf_folder, forms_year_folder, "forms" + output_format)
+        write(out_file, merge_values(documents))
+        out_files.append(out_file)
+    return out_files
+
+
+def fill_pdfs(forms_state, forms_year_folder, parallel=False, max_workers=None, combine_pages=False, flatten=False,
+              output_format=pdf_extension, combine_forms=False, incremental=False):
+    # parallel spreads the forms (and the pages of list states like f8949) over a process pool
+    # the files and their order in the returned list are the same as the sequential ones
+    # combine_pages writes list states in a single file (f8949.pdf) instead of one file per page (f8949_0.pdf, ...)
+    # flatten draws the values in the pages, ready for a print service
+    # output_format fdf_extension or xfdf_extension writes the field values only, see export_fields
+    # incremental writes each form as the blank form followed by its filled widgets (not for flatten, combine_pages)
+    map_folders(output_pdf_folder, forms_year_folder)
+    tasks = pdf_tasks(forms_state, forms_year_folder, combine_pages)
+    if output_format != pdf_extension:
+        return export_fields(tasks, forms_year_folder, output_format, combine_forms)
+
+    if parallel and len(tasks) > 1:
+        max_workers = max_workers or os.cpu_count()
+        # consecutive tasks mostly share a template, each worker parses it once in its template cache
+        chunk_size = max(1, len(tasks) // (4 * max_workers))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(partial(fill_one_pdf, flatten=flatten, incremental=incremental), tasks,
+                              chunksize=chunk_size))
+    else:
+        for task in tasks:
+            fill_one_pdf(task, flatten, incremental)
+    return [outfile for _, outfile, _ in tasks]
 
 
 def merge_pdfs(files, out):
-    writer = PdfWriter()
-    for inpfn in files:
-        writer.addpages(PdfReader(inpfn).pages)
-    writer.write(out)
+    # keeps the form fields, see merge_forms, the files of fill_pdfs(..., incremental=True) included
+    documents = [(os.path.splitext(os.path.basename(inpfn))[0], UpdatedPdfReader(inpfn)) for inpfn in files]
+    merge_forms(documents).write(out)
+
+
+def fill_and_merge_pdfs(forms_state, forms_year_folder, out, write_forms=False, combine_pages=False, flatten=False):
+    # same as fill_pdfs then merge_pdfs, the filled forms go to the merged file without being written and read again
+    # write_forms also writes the files of fill_pdfs, returned in the same order
+    if write_forms:
+        map_folders(output_pdf_folder, forms_year_folder)
+    documents = []
+    out_files = []
+    for template, outfile, ddd in pdf_tasks(forms_state, forms_year_folder, combine_pages):
+        filled = fill_pdf_pages(template, ddd, flatten) if isinstance(ddd, list) else fill_pdf(template, ddd, flatten)
+        if write_forms:
+            write_pdf(outfile, filled)
+            out_files.append(outfile)
+        documents.append((os.path.splitext(os.path.basename(outfile))[0], filled))
+    merge_forms(documents).write(out)
+    logger.info("Exporting PDF file %s succeeded", out)
+    return out_files
 
 
 def save_json(data, out):
@@ -55,7 +153,12 @@ def save_json(data, out):
 
 def gather_inputs(input_year_folder):
     input_folder = os.path.join("input_data", input_year_folder)
-    j = json.load(open(os.path.join(input_folder, 'input.json'), 'rb'))
+    return gather_inputs_file(os.path.join(input_folder, 'input.json'))
+
+
+def gather_inputs_file(input_file):
+    with open(input_file, 'rb') as f:
+        j = json.load(f)
 
     additional_info = {
         'single': True,  # if you're not single too bad for you
@@ -110,6 +213,92 @@ def gather_inputs(input_year_folder):
     return data
 
 
+def engine_version(year):
+    # hash of the code computing one year, editing it invalidates the cached outputs of that year
+    h = hashlib.sha256(chain_cache_version.encode())
+    for module in [fill_taxes_by_year[year].__module__, 'utils.forms_functions', 'utils.forms_tax_tables']:
+        with open(sys.modules[module].__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def fill_taxes_chain(years, cache_folder=chain_cache_folder):
+    # runs consecutive years, each one gets the (forms_state, worksheets) of the previous year for carryover
+    # each year is cached on disk, keyed by its input, its engine and the key of the previous year
+    # so recomputing the last year only costs that year
+    if not os.path.isdir(cache_folder):
+        os.mkdir(cache_folder)
+    outputs = {}
+    previous_output, previous_key = None, ""
+    for year in years:
+        data = gather_inputs(input_year_folder=year)
+        key = hashlib.sha256("\n".join([
+            json.dumps(data, sort_keys=True), engine_version(year), previous_key,
+        ]).encode()).hexdigest()
+        cache_file = os.path.join(cache_folder, year + "_" + key + json_extension)
+        if os.path.isfile(cache_file):
+            with open(cache_file, 'r') as f:
+                output = tuple(json.load(f))
+            logger.info("Chain %s loaded from %s", year, cache_file)
+        else:
+            fill = fill_taxes_by_year[year]
+            output = fill(data) if year == "2018" else fill(data, previous_output)
+            temp_file = cache_file + ".tmp"
+            save_json(data=output, out=temp_file)
+            os.replace(temp_file, cache_file)  # never leave a partial file behind
+            logger.info("Chain %s computed and saved to %s", year, cache_file)
+        outputs[year] = output
+        previous_output, previous_key = output[:2], key
+    return outputs
+
+
+def list_batch_inputs(source):
+    # source is either a folder of input json files
+    # or a manifest file listing one input file per line (relative to the manifest)
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "*" + json_extension)))
+    manifest_folder = os.path.dirname(source)
+    # blank lines and comment lines (# after any indentation) are skipped
+    with open(source, 'r') as f:
+        lines = [l.strip() for l in f]
+    return [os.path.join(manifest_folder, l) for l in lines if l and not l.startswith('#')]
+
+
+def fill_one_return_2023(input_file):
+    # runs in a worker process
+    # errors are returned rather than raised, so that one bad return does not stop the batch
+    try:
+        data = gather_inputs_file(input_file)
+        _, _, summary = fill_taxes_2023(d=data, output_2022=None)
+        return input_file, summary, None
+    except Exception as e:
+        return input_file, None, f"{type(e).__name__}: {e}"
+
+
+def batch_2023(source, out="batch" + "2023" + json_extension, max_workers=None):
+    input_files = list_batch_inputs(source)
+    max_workers = max_workers or os.cpu_count()
+    # big chunks keep the workers busy without paying the inter-process round trip for every return
+    chunk_size = max(1, len(input_files) // (4 * max_workers))
+
+    start = time.perf_counter()
+    summaries = {}
+    errors = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for input_file, summary, error in executor.map(fill_one_return_2023, input_files, chunksize=chunk_size):
+            if error is None:
+                summaries[input_file] = summary
+            else:
+                logger.error("Return failed %s -- %s", input_file, error)
+                errors[input_file] = error
+    elapsed = time.perf_counter() - start
+
+    save_json(data={'summary': summaries, 'errors': errors}, out=out)
+    logger.info("Batch of %d returns (%d failed) with %d workers in %.2fs - %.1f returns per second",
+                len(input_files), len(errors), max_workers, elapsed, len(input_files) / elapsed if elapsed else 0.)
+    return summaries, errors
+
+
 def main():
     # data2018 = gather_inputs(input_year_folder="2018")
     # states2018, worksheets_all2018 = fill_taxes_2018(data2018)
@@ -143,6 +332,9 @@ def main():
     # outfile2022 = "forms" + "2022" + pdf_extension
     # merge_pdfs(pdf_files2022, outfile2022)
 
+    # with carryover from the previous years, each year computed once and cached
+    # states2023, worksheets_2023, summary_2023 = fill_taxes_chain(["2022", "2023"])["2023"]
+
     data2023 = gather_inputs(input_year_folder="2023")
     # states2023, worksheets_2023, summary_2023 =
     # fill_taxes_2023(d=data2023, output_2022=(states2022, worksheets_all2022))
@@ -150,14 +342,16 @@ def main():
     save_json(data=states2023, out="data" + "2023" + json_extension)
     save_json(data=worksheets_2023, out="worksheet" + "2023" + json_extension)
     save_json(data=summary_2023, out="summary" + "2023" + json_extension)
-    pdf_files2023 = fill_pdfs(states2023, "2023")
     outfile2023 = "forms" + "2023" + pdf_extension
-    merge_pdfs(pdf_files2023, outfile2023)
+    # pdf_files2023 = fill_pdfs(states2023, "2023")  # parallel=True for returns with many 8949 pages
+    # merge_pdfs(pdf_files2023, outfile2023)
+    fill_and_merge_pdfs(states2023, "2023", outfile2023, write_forms=True)
 
 
 if __name__ == "__main__":
     # year_folder = "2019"
     main()
+    # batch_2023(source=os.path.join("input_data", "batch"))  # folder or manifest of input json files
 
     # outfile = "forms" + pdf_extension
     # pdf_files = [
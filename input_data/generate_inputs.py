@@ -0,0 +1,173 @@
+# seeded synthetic input.json files for load and scale testing
+# same schema as build_json: W2 entries and 1099 entries with Trades (and Contract1256)
+# trades are streamed to the file one at a time, millions of trades do not need to fit in memory
+#   python -m input_data.generate_inputs --trades 1000000 --brokers 50 --out input_data/synthetic/input.json
+
+import os
+import json
+import random
+import argparse
+import logging
+from datetime import date, timedelta
+from utils.logger import process_logger
+
+logger = logging.getLogger('input_data')
+process_logger(logger, file_name="json_data")
+
+tax_year = 2023
+wash_sale_rate = 0.05  # of the losing trades
+aggregated_rate = 0.001  # brokers reporting a single aggregated line instead of the detail
+max_contracts = 3  # Form 6781 has 3 lines, more need a new page
+# yearly wages of each W2, the default is above the Tax Table (taxable income from 100k)
+# lower ranges (--wage-range 20000 100000) go through the Tax Table, wages should stay above the standard deduction:
+# the engines do not handle a taxable income of 0
+wage_range = (100_000, 400_000)
+symbols = ["BIG ETF", "SMALL ETF", "TECH CORP", "BANK HOLDINGS", "OIL INC", "PHARMA LTD", "RETAIL CO", "BOND FUND"]
+
+person = {
+    "FullName": "Commando French",
+    "FirstName": "French",
+    "LastName": "Commando",
+    "Address": "111 111TH ST",
+    "Address_apt": "11A",
+    "Address_city": "BROOKLYN",
+    "Address_state": "NY",
+    "Address_zip": "11111",
+    "SSN": "XXXXX5555",
+}
+
+
+def split(n, parts):
+    # n items over parts, as evenly as possible
+    return [n // parts + (i < n % parts) for i in range(parts)]
+
+
+def generate_w2(rng, i, wage_range=wage_range):
+    wages = round(rng.uniform(*wage_range), 2)
+    return person | {
+        "Company": f"Company {i} LLC",
+        "Company_address": f"{i + 1} MAIN ST",
+        "Company_city": "NEW YORK",
+        "Company_state": "NY",
+        "Company_zip": "10000",
+        "Wages": wages,
+        "SocialSecurity_wages": min(wages, 160_200.),
+        "Medicare_wages": wages,
+        "Federal_tax": round(wages * rng.uniform(0.15, 0.30), 2),
+        "SocialSecurity_tax": round(min(wages, 160_200.) * 0.062, 2),
+        "Medicare_tax": round(wages * 0.0145, 2),
+        "State": "NY",
+        "State_tax": round(wages * rng.uniform(0.04, 0.07), 2),
+        "Local_tax": round(wages * rng.uniform(0.02, 0.04), 2),
+        "Locality": "NEW YORK CITY",
+    }
+
+
+def generate_1099(rng, i, contracts=0):
+    # without the trades, they are streamed separately
+    ordinary = round(rng.uniform(0, 5_000), 2)
+    d = {
+        "Institution": f"Broker {i} HOLDINGS, INC.",
+        "Interest": round(rng.uniform(0, 1_000), 2),
+        "Ordinary Dividends": ordinary,
+        "Qualified Dividends": round(ordinary * rng.uniform(0.5, 1), 2),
+    }
+    if contracts:
+        d["Contract1256"] = [{"ProfitOrLoss": round(rng.uniform(-20_000, 20_000), 2)} for _ in range(contracts)]
+    return d
+
+
+def format_date(u):
+    return u.strftime("%m/%d/%Y")
+
+
+def generate_trade(rng):
+    # form codes: A B C short term (covered, not covered, not on 1099-B), D E F long term
+    long_short = rng.choice(["SHORT", "LONG"])
+    form_code = rng.choice("ABC" if long_short == "SHORT" else "DEF")
+    sold = date(tax_year, 1, 1) + timedelta(days=rng.randrange(365))
+    held = rng.randrange(1, 365) if long_short == "SHORT" else rng.randrange(366, 3650)
+    shares = float(rng.randint(1, 1_000))
+    price = rng.uniform(5, 500)
+    proceeds = round(shares * price, 2)
+    cost = round(shares * price * rng.uniform(0.6, 1.4), 2)
+    trade = {
+        "SalesDescription": rng.choice(symbols),
+        "Shares": shares,
+        "DateAcquired": format_date(sold - timedelta(days=held)),
+        "DateSold": format_date(sold),
+        "Proceeds": proceeds,
+        "Cost": cost,
+        "WashSaleCode": "",
+        "WashSaleValue": 0,
+        "LongShort": long_short,
+        "FormCode": form_code,
+    }
+    if cost > proceeds and rng.random() < wash_sale_rate:
+        trade["WashSaleCode"] = "W"
+        trade["WashSaleValue"] = round((cost - proceeds) * rng.uniform(0.1, 1), 2)
+    return trade
+
+
+def generate_aggregated(rng):
+    # like some brokers do for covered short term trades
+    proceeds = round(rng.uniform(1_000, 100_000), 2)
+    return {
+        "SalesDescription": "Aggregated", "Shares": "Aggregated",
+        "DateAcquired": "Aggregated", "DateSold": "Aggregated", "WashSaleCode": "Aggregated",
+        "Proceeds": proceeds, "Cost": round(proceeds * rng.uniform(0.8, 1.2), 2), "WashSaleValue": 0,
+        "LongShort": "SHORT", "FormCode": "A",
+    }
+
+
+def generate_trades(rng, n):
+    for _ in range(n):
+        yield generate_aggregated(rng) if rng.random() < aggregated_rate else generate_trade(rng)
+
+
+def generate_input(n_w2=1, n_1099=1, n_trades=0, contracts=0, seed=0, wage_range=wage_range):
+    # whole input in memory, same content as write_input with the same arguments
+    rng = random.Random(seed)
+    w2 = [generate_w2(rng, i, wage_range) for i in range(n_w2)]
+    forms_1099 = []
+    for i, (n, c) in enumerate(zip(split(n_trades, n_1099), split(min(contracts, max_contracts), n_1099))):
+        forms_1099.append(generate_1099(rng, i, c) | {"Trades": list(generate_trades(rng, n))})
+    return {"W2": w2, "1099": forms_1099}
+
+
+def write_input(out, n_w2=1, n_1099=1, n_trades=0, contracts=0, seed=0, wage_range=wage_range):
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, 'w') as f:
+        f.write('{"W2": ')
+        json.dump([generate_w2(rng, i, wage_range) for i in range(n_w2)], f)
+        f.write(', "1099": [')
+        for i, (n, c) in enumerate(zip(split(n_trades, n_1099), split(min(contracts, max_contracts), n_1099))):
+            if i:
+                f.write(', ')
+            f.write(json.dumps(generate_1099(rng, i, c))[:-1] + ', "Trades": [')
+            for j, trade in enumerate(generate_trades(rng, n)):
+                if j:
+                    f.write(', ')
+                f.write(json.dumps(trade))
+            f.write(']}')
+        f.write(']}')
+    logger.info("Generated %s with %i W2, %i 1099 and %i trades", out, n_w2, n_1099, n_trades)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic input.json")
+    parser.add_argument('--w2', type=int, default=1)
+    parser.add_argument('--brokers', type=int, default=1)
+    parser.add_argument('--trades', type=int, default=100)
+    parser.add_argument('--contracts', type=int, default=0, help=f"Section 1256 contracts, at most {max_contracts}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--wage-range', nargs=2, type=float, default=wage_range, metavar=('LOW', 'HIGH'),
+                        help="wages of each W2, below 100000 for the Tax Table")
+    parser.add_argument('--out', default=os.path.join("input_data", "synthetic", "input.json"))
+    args = parser.parse_args()
+    write_input(args.out, args.w2, args.brokers, args.trades, args.contracts, args.seed, tuple(args.wage_range))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,42 +4,41 @@
 # then generate a pdf file with fields filled with increasing integers
 # .keys is generated automatically
 # next: just need to replace integer values with names
-# (using the fill_keys.py script)
+# (the layouts of fields_spec/<year>.json, compiled by the fill_keys.py script)
+# the numbered pdf files (key_mapping/<year>) are what the layouts are written from, to add a new form
+# fill_keys does not need this script, it numbers the fields the same way when building the key maps
 from utils.forms_utils import *
 
 
 year_folder = "2019"
 
 
+def write_atomic(out_file, write):
+    # write(path) writes the file, renamed at the end so a reader never sees a partial file
+    write(out_file + ".tmp")
+    os.replace(out_file + ".tmp", out_file)
+
+
 def process_pdf(file):
-    year_name = os.path.join(key_mapping_folder, year_folder)
-    forms_year_folder = os.path.join(forms_folder, year_folder)
+    year_name = os.path.join(key_mapping_folder, form_year(file))
+    forms_year_folder = os.path.join(forms_folder, form_year(file))
     k_file = os.path.splitext(file)[0] + keys_extension
-    if not os.path.isfile(k_file):
-        d = {}
-        d_type = {}  # /Tx for text /Btn for button
-        i = 0
-        template_pdf = pdfrw.PdfReader(file)
-        for annotations in template_pdf.pages:
-            if ANNOT_KEY in annotations:
-                for annotation in annotations[ANNOT_KEY]:
-                    if annotation[SUBTYPE_KEY] == WIDGET_SUBTYPE_KEY:
-                        if annotation[ANNOT_FIELD_KEY]:
-                            key = annotation[ANNOT_FIELD_KEY][1:-1]
-                            fields_type = annotation[ANNOT_FIELD_TYPE_KEY]
-                            d[key] = str(i)
-                            d_type[key] = fields_type
-                            i += 1
+    d = {}
+    d_type = {}  # /Tx for text /Btn for button
+    for key, field in template_cache.index(file).items():
+        d[key] = str(field['widgets'][-1][2])
+        d_type[key] = field['type']
+
+    k_file_map = os.path.join(year_name, os.path.relpath(k_file, forms_year_folder))
 
-        k_file_map = os.path.join(year_name, os.path.relpath(k_file, forms_year_folder))
-        with open(k_file_map, 'w+') as f:
-            logger.info("File created %s", k_file_map)
+    def write_keys(path):
+        with open(path, 'w') as f:
             for k, i in d.items():
                 f.write(str(i) + "\t\t" + k + "\t\t" + d_type[k] + "\n")
-    else:
-        d = load_keys(k_file)
+    write_atomic(k_file_map, write_keys)
+    logger.info("File created %s", k_file_map)
     out_file = os.path.join(year_name, os.path.relpath(file, forms_year_folder))
-    fill_pdf_from_keys(file=file, out_file=out_file, d=d)
+    write_atomic(out_file, lambda path: fill_pdf_from_keys(file=file, out_file=path, d=d))
 
 
 def process_all():
@@ -24,7 +24,6 @@
 ====================================================================================================================
 """
 
-import key_matcher
 import fill_keys
 import fill_taxes
 import input_data.build_json
@@ -33,8 +32,6 @@ import utils.forms_clean
 
 def main():
     for form_filing_year in ["2023"]:
-        key_matcher.year_folder = form_filing_year
-        key_matcher.main()
         fill_keys.year_folder = form_filing_year
         fill_keys.main()
 
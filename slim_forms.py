@@ -0,0 +1,28 @@
+# one time preprocessing of the blank forms: slimmed and compressed copies in forms_slim, see utils/forms_slim.py
+# the fill path (fill_taxes.pdf_tasks) uses them instead of the forms, run again when the forms change
+#   python slim_forms.py --years 2023
+import os
+import glob
+import argparse
+from utils.forms_constants import forms_folder, pdf_extension
+from utils.forms_slim import slim_form
+
+
+def slim_forms(years, keep_structure=False):
+    out_files = []
+    for year in years:
+        for u in sorted(glob.glob(os.path.join(forms_folder, year, "*", "f*" + pdf_extension))):
+            out_files.append(slim_form(u, keep_structure))
+    return out_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slimmed copies of the blank forms, used to fill")
+    parser.add_argument('--years', nargs='+', default=sorted(os.listdir(forms_folder)))
+    parser.add_argument('--keep-structure', action='store_true', help="keep the tags (structure tree)")
+    args = parser.parse_args()
+    slim_forms(args.years, args.keep_structure)
+
+
+if __name__ == "__main__":
+    main()
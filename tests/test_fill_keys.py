@@ -0,0 +1,55 @@
+import os
+import glob
+import shutil
+import pytest
+import fill_keys
+from utils.forms_utils import read_key_map, keymap_extension
+from utils.forms_constants import forms_folder, fields_spec_folder, build_cache_folder
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    # two 2023 forms and the 2023 spec in a temporary working directory
+    for form in ("f1040sb", "f1040s3"):
+        target = tmp_path / forms_folder / "2023" / "Federal" / (form + ".pdf")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(os.path.join(repo_folder, forms_folder, "2023", "Federal", form + ".pdf"), target)
+    shutil.copytree(os.path.join(repo_folder, fields_spec_folder), tmp_path / fields_spec_folder)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def cached_forms():
+    return sorted(os.path.basename(u).split("_")[0] for u in glob.glob(os.path.join(build_cache_folder, "**", "*"),
+                                                                        recursive=True) if os.path.isfile(u))
+
+
+def test_failed_build_is_not_cached(workspace, monkeypatch):
+    stale = os.path.join(forms_folder, "2023", "Federal", "f1040sb" + keymap_extension)
+    with open(stale, 'w') as f:
+        f.write("stale")
+    build_key_map = fill_keys.build_key_map
+
+    def failing(file, layout):
+        if file == os.path.join(forms_folder, "2023", "Federal", "f1040sb.pdf"):
+            raise ValueError("bad form")
+        return build_key_map(file, layout)
+
+    monkeypatch.setattr(fill_keys, "build_key_map", failing)
+    errors = fill_keys.build_years(["2023"], parallel=False)
+    assert list(errors) == [os.path.join(forms_folder, "2023", "Federal", "f1040sb.pdf")]
+    assert cached_forms() == ["f1040s3"]
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_year_without_spec(workspace, parallel):
+    # forms of a new year added before its fields spec: empty key maps, the other years are built
+    new_form = os.path.join(forms_folder, "2099", "Federal", "f1040.pdf")
+    os.makedirs(os.path.dirname(new_form))
+    shutil.copy(os.path.join(repo_folder, forms_folder, "2023", "Federal", "f1040.pdf"), new_form)
+    assert fill_keys.build_years(parallel=parallel) == {}
+    assert read_key_map(os.path.splitext(new_form)[0] + keymap_extension) == {}
+    assert read_key_map(os.path.join(forms_folder, "2023", "Federal", "f1040sb" + keymap_extension))
+    assert cached_forms() == ["f1040", "f1040s3", "f1040sb"]
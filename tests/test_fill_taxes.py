@@ -0,0 +1,30 @@
+import os
+import pdfrw
+from fill_taxes import list_batch_inputs, merge_pdfs
+from utils.forms_utils import fill_pdf_from_keys, template_cache
+from utils.forms_constants import forms_folder, pdf_extension
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_manifest_skips_comments_and_blank_lines(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# returns\na.json\n\n   \n  # indented comment\n  b.json  \n\tc.json\n")
+    assert list_batch_inputs(str(manifest)) == [os.path.join(str(tmp_path), u) for u in ("a.json", "b.json", "c.json")]
+
+
+def test_incremental_outputs_through_merge_pdfs(tmp_path):
+    # the filled widgets of the incremental update are in the merged pdf, not the blank ones of the first revision
+    files, expected = [], []
+    for form in ("f1040sb", "f1040s3"):
+        template = os.path.join(repo_folder, forms_folder, "2023", "Federal", form + pdf_extension)
+        index = template_cache.index(template)
+        d = {key: f"{form} {i}" for i, (key, field) in enumerate(index.items()) if field['type'] == '/Tx'}
+        files.append(str(tmp_path / (form + pdf_extension)))
+        fill_pdf_from_keys(template, files[-1], d, incremental=True)
+        expected += [v for key, v in d.items() for _ in index[key]['widgets']]
+    out = str(tmp_path / ("forms" + pdf_extension))
+    merge_pdfs(files, out)
+    values = [annotation.V.decode() for page in pdfrw.PdfReader(out).pages for annotation in page.Annots or []
+              if annotation.V is not None and annotation.FT == '/Tx']
+    assert sorted(values) == sorted(expected)
@@ -0,0 +1,19 @@
+import numpy as np
+from utils.forms_functions import computation_2023
+from utils.forms_tax_tables import tax_table_limit
+
+table = computation_2023.tax_table
+
+
+def test_scalar_and_array_paths_agree():
+    amounts = [-10_000, -3, 0, 1, 4, 5, 2_999, 3_000, 3_001, 50_025,
+               tax_table_limit - 50, tax_table_limit - 1, tax_table_limit]
+    scalar = [computation_2023(a) for a in amounts]
+    array = computation_2023(np.array(amounts, dtype=float))
+    assert np.allclose(scalar, array)
+    assert [table(a) for a in amounts] == list(table.vectorized(amounts))
+
+
+def test_negative_amounts_are_clamped():
+    assert computation_2023(-3) == 0
+    assert table(-3) == table(0) == 0
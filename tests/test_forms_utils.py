@@ -0,0 +1,38 @@
+import io
+import pdfrw
+from utils.forms_utils import merge_forms, ResourcePool
+
+
+def form_pdf(extra_objects):
+    # one page using font F1, extra_objects indirect objects first so the font gets another object number
+    font = pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Font, Subtype=pdfrw.PdfName.Type1,
+                                 BaseFont=pdfrw.PdfName.Helvetica)
+    page = pdfrw.PdfDict(Type=pdfrw.PdfName.Page, MediaBox=[0, 0, 612, 792],
+                         Extra=pdfrw.PdfArray([pdfrw.IndirectPdfDict(N=i) for i in range(extra_objects)]),
+                         Resources=pdfrw.PdfDict(Font=pdfrw.PdfDict(F1=font)))
+    out = io.BytesIO()
+    writer = pdfrw.PdfWriter()
+    writer.addpage(page)
+    writer.write(out)
+    return pdfrw.PdfReader(fdata=out.getvalue())
+
+
+def test_same_font_of_two_forms_is_one_object():
+    first, second = form_pdf(0), form_pdf(3)
+    fonts = [pdf.pages[0].Resources.Font.F1 for pdf in (first, second)]
+    assert fonts[0].indirect != fonts[1].indirect  # read from different object numbers
+
+    writer = merge_forms([("first", first), ("second", second)])
+    merged = [page.Resources.Font.F1 for page in writer.pagearray]
+    assert merged[0] is merged[1]
+
+    out = io.BytesIO()
+    writer.write(out)
+    assert out.getvalue().count(b"/BaseFont /Helvetica") == 1
+
+
+def test_direct_and_indirect_objects_are_not_merged():
+    pool = ResourcePool()
+    direct = pdfrw.PdfDict(Type=pdfrw.PdfName.Font, BaseFont=pdfrw.PdfName.Helvetica)
+    indirect = pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Font, BaseFont=pdfrw.PdfName.Helvetica)
+    assert pool.intern(direct) is not pool.intern(indirect)
@@ -0,0 +1,16 @@
+import pytest
+from fill_taxes import fill_taxes_2023, gather_inputs_file
+from input_data.generate_inputs import write_input, generate_input, split
+from utils.form_worksheet_names import k_it201
+
+
+@pytest.mark.parametrize("n_1099, n_trades", [(5, 3), (2, 0)])
+def test_more_brokers_than_trades(tmp_path, n_1099, n_trades):
+    # brokers without trades, and no capital gain line on the 1040
+    input_file = str(tmp_path / "input.json")
+    write_input(input_file, n_w2=1, n_1099=n_1099, n_trades=n_trades)
+    data = gather_inputs_file(input_file)
+    assert [len(u['Trades']) for u in data['1099']] == split(n_trades, n_1099)
+    assert data['1099'] == generate_input(n_w2=1, n_1099=n_1099, n_trades=n_trades)['1099']
+    states, _, _ = fill_taxes_2023(d=data, output_2022=None)
+    assert k_it201 in states
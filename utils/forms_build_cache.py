@@ -0,0 +1,77 @@
+# build cache of the key maps made by fill_keys, kept across runs (clean does not remove it)
+# each form is keyed by the hash of its pdf, of the fields spec of its year and of the code numbering and naming
+# the fields, an unchanged form gets its key map back without being parsed again
+import os
+import sys
+import glob
+import hashlib
+import importlib
+from utils.forms_constants import logger, forms_folder, build_cache_folder, fields_spec_folder, pdf_extension, \
+    keymap_extension, json_extension, cached_keys_extension
+
+build_cache_version = "2"  # bump to drop every cached form
+spec_modules = ['fill_keys', 'utils.forms_utils']  # field numbering and field names
+
+
+def spec_version(year_folder):
+    h = hashlib.sha256(build_cache_version.encode())
+    for module in spec_modules:
+        module = sys.modules.get(module) or importlib.import_module(module)
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    spec_file = os.path.join(fields_spec_folder, year_folder + json_extension)
+    if os.path.isfile(spec_file):  # a new year has no spec yet, writing it changes the version
+        with open(spec_file, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def form_files(year_folder):
+    # the forms with a key map
+    return sorted(glob.glob(os.path.join(forms_folder, year_folder, "*", "f*" + pdf_extension)))
+
+
+def cache_file(file, spec):
+    with open(file, 'rb') as f:
+        key = hashlib.sha256(f.read() + spec.encode()).hexdigest()
+    rel = os.path.splitext(os.path.relpath(file, forms_folder))[0]
+    return os.path.join(build_cache_folder, rel + "_" + key + cached_keys_extension)
+
+
+def restore_key_maps(year_folder):
+    # key maps of the unchanged forms put back next to the forms, returns these forms
+    spec = spec_version(year_folder)
+    restored = []
+    for u in form_files(year_folder):
+        cached = cache_file(u, spec)
+        if not os.path.isfile(cached):
+            continue
+        map_file = os.path.splitext(u)[0] + keymap_extension
+        with open(cached, 'rb') as f:
+            data = f.read()
+        with open(map_file + ".tmp", 'wb') as f:
+            f.write(data)
+        os.replace(map_file + ".tmp", map_file)
+        restored.append(u)
+        logger.info("Key map restored from %s", cached)
+    return restored
+
+
+def store_key_maps(year_folder, built):
+    # key maps that fill_keys just built, saved under the current spec
+    # a key map left over by an earlier run (the build of its form failed this time) is not stored
+    spec = spec_version(year_folder)
+    for u in form_files(year_folder):
+        if u not in built:
+            continue
+        map_file = os.path.splitext(u)[0] + keymap_extension
+        cached = cache_file(u, spec)
+        if not os.path.isfile(map_file) or os.path.isfile(cached):
+            continue
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        with open(map_file, 'rb') as f:
+            data = f.read()
+        with open(cached + ".tmp", 'wb') as f:
+            f.write(data)
+        os.replace(cached + ".tmp", cached)  # never leave a partial file behind
+        logger.info("Key map cached in %s", cached)
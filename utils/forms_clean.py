@@ -1,6 +1,6 @@
 import os
 import shutil
-from utils.forms_constants import keys_extension, key_mapping_folder, \
+from utils.forms_constants import keys_extension, keymap_extension, key_mapping_folder, \
     fields_mapping_folder, log_extension, json_extension, output_pdf_folder
 
 
@@ -15,7 +15,8 @@ def remove_by_extension(extension):
 
 
 def remove_folder(folder):
-    shutil.rmtree(folder)
+    if os.path.isdir(folder):  # key_mapping and fields_mapping are only written by key_matcher and debug runs
+        shutil.rmtree(folder)
 
 
 def clean(filing_year):
@@ -25,6 +26,7 @@ def clean(filing_year):
     # remove_by_extension(json_extension)
     # remove keys files
     remove_by_extension(keys_extension)
+    remove_by_extension(keymap_extension)
 
     # remove key_mapping folder
     year_keys_name = os.path.join(key_mapping_folder, filing_year)
@@ -7,14 +7,25 @@ process_logger(logger, file_name='key_matching')
 
 key_mapping_folder = 'key_mapping'
 fields_mapping_folder = 'fields_mapping'
+fields_spec_folder = "fields_spec"
 output_pdf_folder = "output"
+chain_cache_folder = "chain_cache"
+build_cache_folder = "build_cache"
 forms_folder = "forms"
+forms_slim_folder = "forms_slim"
 
 keys_extension = ".keys"
+keymap_extension = ".keymap"
 pdf_extension = ".pdf"
-fields_extension = ".fields"
 log_extension = ".log"
 json_extension = ".json"
+tax_table_extension = ".npz"
+index_extension = ".index"
+fdf_extension = ".fdf"
+xfdf_extension = ".xfdf"
+cached_keys_extension = ".cached_keys"  # not .keys, clean removes those
+
+template_cache_size = 32  # blank forms kept parsed in memory, per process
 
 ANNOT_KEY = '/Annots'
 ANNOT_FIELD_KEY = '/T'
@@ -3,504 +3,528 @@ from utils.forms_functions import get_main_info, computation_2019 as computation
 from utils.form_worksheet_names import *
 from utils.forms_constants import logger
 
-
-def fill_taxes_2019(d, output_2018=None):
-    if output_2018 is not None:
-        states_2018, worksheets_all_2018 = output_2018
-
-    main_info = get_main_info(d)
-    wages = sum(w['Wages'] for w in d['W2'])
-    federal_tax = sum(w['Federal_tax'] for w in d['W2'])
-    social_security_tax = sum(w['SocialSecurity_tax'] for w in d['W2'])
-    medicare_tax = sum(w['Medicare_tax'] for w in d['W2'])
-    state_tax = sum(w['State_tax'] for w in d['W2'])
-    local_tax = sum(w['Local_tax'] for w in d['W2'])
-
-    has_1099 = '1099' in d
-    dividends_qualified = None
-    additional_income = None
-
-    if has_1099:
-        n_trades = sum(len(i['Trades']) for i in d['1099'] if 'Trades' in i)
-        # additional_income = n_trades > 0
-        sum_trades = {"SHORT": {"Proceeds": 0, "Cost": 0, "Adjustment": 0, "Gain": 0},
-                      "LONG": {"Proceeds": 0, "Cost": 0, "Adjustment": 0, "Gain": 0}}  # from 8949 to fill 1040sd
-
-    standard_deduction = 12200  # if single or married filing separately
-    qualified_business_deduction = 0
-
-    forms_state = {}  # mapping name of forms with content
-    worksheets = {}  # worksheets need not be printed
-
-    class Form:
-        def __init__(self, key):
-            self.key = key
-            self.d = {}
-            forms_state[self.key] = self.d
-
-        def push_to_dict(self, key, value, round_i=2):
-            if value != 0:
-                self.d[key] = round(value, round_i)
-
-        def push_name_ssn(self, prefix="", suffix=""):
-            self.d[prefix + 'name' + suffix] = forms_state[k_1040]['self_first_name_initial'] \
-                             + " " + forms_state[k_1040]['self_last_name']
-            self.d[prefix + 'ssn' + suffix] = main_info['ssn']
-
-        def push_sum(self, key, it):
-            self.d[key] = sum(self.d.get(k, 0) for k in it)
-
-        def revert_sign(self, key):
-            if key in self.d:
-                self.d[key] = -self.d[key]
-
-        def build(self):
-            raise NotImplementedError()
-
-    class Form1040(Form):
-        def __init__(self):
-            Form.__init__(self, k_1040)
-
-        def build(self):
-            first_name_and_initial = main_info['first_name']
-            if main_info['initial'] != "":
-                first_name_and_initial += " " + main_info['initial']
-            self.d.update({
-                'single': True,
-                'self_first_name_initial': first_name_and_initial,
-                'self_last_name': main_info['last_name'],
-                'self_ssn': main_info['ssn'],
-                'address': main_info['address_street_and_number'],
-                'apt': main_info['address_apt'],
-                'city_state_zip': main_info['address_city_state_zip'],
-                'full_year_health_coverage_or_exempt': d['full_year_health_coverage_or_exempt'],
-                'presidential_election_self': d['presidential_election_self'],
-                'self_occupation': d['occupation'],
-                'phone': d['phone'],
-                'email': d['email'],
-            })
-
-            self.push_to_dict('1', wages)
-
-            if has_1099:
-                Form1040sb().build()
-                self.push_to_dict('2_b', forms_state[k_1040sb]['4_value'])
-                self.push_to_dict('3_b', forms_state[k_1040sb]['6_value'])
-
-                if forms_state[k_1040sb]['4_value'] == 0 \
-                        and forms_state[k_1040sb]['6_value'] == 0 \
-                        and 'foreign_account' not in d:
-                    del forms_state[k_1040sb]
-
-                nonlocal dividends_qualified
-                dividends_qualified = sum(i.get('Qualified Dividends', 0) for i in d['1099'])
-                self.push_to_dict('3_a', dividends_qualified)
-
-            self.d["6_n"] = not d['scheduleD']
-            if d['scheduleD']:
-                Form8949().build()  # build 8949 first
-                Form1040sd().build()
-                self.push_to_dict('6_value', -forms_state[k_1040sd]['21'])
-
-            # if additional_income:
-                # need line 22 from schedule 1
-                # Form1040s1().build()
-                # self.push_to_dict('6_from_s1_22', forms_state[k_1040s1]['22_dollar'])
-
-            self.push_sum('7_b', ['1', '2_b', '3_b', '4_b', '4_d', '5_b', '6_value', '7_a'])  # total income
-
-            if additional_income:
-                self.push_to_dict('8_a', forms_state[k_1040s1].get('22', 0))
-
-            self.push_to_dict('8_b', self.d['7_b'] - self.d.get('8_a', 0))  # Adjusted Gross Income
-
-            self.push_to_dict('9', standard_deduction)
-            self.push_to_dict('10', qualified_business_deduction)
-            self.push_sum('11_a', ['9', '10'])
-            self.push_to_dict('11_b', max(0, self.d.get('8_b', 0) - self.d.get('11_a', 0)))  # Taxable income
-
-            if dividends_qualified:
-                qualified_dividend_worksheet = QualifiedDividendsCapitalGainTaxWorksheet()
-                qualified_dividend_worksheet.build()
-                self.push_to_dict('12_a', worksheets[w_qualified_dividends_and_capital_gains][27])
-            else:
-                self.push_to_dict('12_a', computation(self.d['11_b']))
-
-            # # add from 11b
-            # should_fill = ShouldFill6251Worksheet()
-            # should_fill.build()
-            # awt = 0
-            # if should_fill.fill6251:
-            #     Form1040s2().build()
-            #     Form6251().build()
-            #     awt = forms_state[k_6251]['11_dollar']
-            # if awt > 0:
-            #     self.d['11b'] = True
-            #     self.push_to_dict('11_dollar', self.d['11a_tax'] + awt)
-            # else:
-            #     self.push_sum('11_dollar', ['11a_tax'])
-            # if has_1099:
-            #     Form1040s3().build()
-            #     foreign_tax = forms_state[k_1040s3]['55_dollar']
-            #     if foreign_tax != 0:
-            #         self.d['12b'] = True
-            #         self.push_to_dict('12_dollar', forms_state[k_1040s3]['55_dollar'])
-            #     else:
-            #         del forms_state[k_1040s3]
-
-            self.push_sum('12_b', ['12_a'])  # plus schedule 2 line 3
-            self.push_to_dict('13_a', 0)  # child tax credit
-            self.push_sum('13_b', ['13_a'])  # plus schedule 3 line 7
-            self.push_to_dict('14', max(0, self.d.get('12_b', 0) - self.d.get('13_b', 0)))
-            self.push_to_dict('15', 0)  # other taxes from Schedule 2 line 10
-            self.push_sum('16', ['14', '15'])  # total tax
-            self.push_to_dict('17', federal_tax)
-
-            self.push_to_dict('18_a', 0)  # Earned Income Credit
-            self.push_to_dict('18_b', 0)  # Additional child tax Credit
-            self.push_to_dict('18_c', 0)  # American opportunity credit Form 8863, line 8
-            self.push_to_dict('18_d', 0)  # Schedule 3, line 14
-            self.push_sum('18_e', ['18_a', '18_b', '18_c', '18_d'])  # total other payments and refundable credit
-
-            self.push_sum('19', ['17', '18_e'])  # total payments
-
-            # refund
-            overpaid = self.d['19'] - self.d['16']
-            if overpaid > 0:
-                self.push_to_dict('20', overpaid)
-                # all refunded
-                self.push_to_dict('21a_value', overpaid)
-                self.d['21b'] = d['routing_number']
-                if d['checking']:
-                    self.d['21c_checking'] = True
-                else:
-                    self.d['21c_savings'] = True
-                self.d['21d'] = d['account_number']
-                self.d['22'] = "-0-"
-            else:
-                self.push_to_dict('23', -overpaid)
-                self.push_to_dict('24', 0)
-
-    class Form1040NR(Form):
-        def __init__(self):
-            Form.__init__(self, k_1040nr)
-
-    class Form1040s1(Form):
-        def __init__(self):
-            Form.__init__(self, k_1040s1)
-
-        def build(self):
-            self.push_name_ssn()
-            # capital gains
-            if n_trades > 0:
-                if not d['scheduleD']:
-                    self.push_to_dict('13_not_d', False)
-                if k_1040sd not in forms_state:
-                    Form8949().build()  # build 8949 first
-                    Form1040sd().build()
-
-            gains = forms_state[k_1040sd]['16']
-            if gains >= 0:
-                self.push_to_dict('13_dollar', gains)
-            else:
-                self.push_to_dict('13_dollar', -forms_state[k_1040sd]['21'])
-            self.push_sum('22_dollar',
-                          ['1_9b_dollar',
-                           *[str(i) + "_dollar"
-                             for i in range(10, 22)]
-                           ])
-
-    class Form1040s2(Form):
-        def __init__(self):
-            Form.__init__(self, k_1040s2)
-
-        def build(self):
-            self.push_name_ssn()
-
-    class Form1040s3(Form):
-        def __init__(self):
-            Form.__init__(self, k_1040s3)
-
-        def build(self):
-            self.push_name_ssn()
-            # I don't need the 1116
-            # https://turbotax.intuit.com/tax-tips/military/filing-irs-form-1116-to-claim-the-foreign-tax-credit/L2ODfqp89
-            foreign_tax = sum(i.get('Foreign Tax', 0) for i in d['1099'])
-            self.push_to_dict('48_dollar', foreign_tax)
-            self.push_sum('55_dollar', [str(i) + "_dollar" for i in range(48, 55)])
-
-    class Form1040sb(Form):
-        def __init__(self):
-            Form.__init__(self, k_1040sb)
-
-        def build(self):
-            self.push_name_ssn()
-
-            if len(d['1099']) > 14:
-                logger.error("1040sb - too many brokers")
-
-            def fill_value(index, key):
-                i = 1
-                for f in d['1099']:
-                    if key in f and f[key] != 0:
-                        self.d["{}_{}_payer".format(index, str(i))] = f['Institution']
-                        self.push_to_dict("{}_{}_value".format(index, str(i)), f[key])
-                        i += 1
-            fill_value("1", "Interest")
-            fill_value("5", "Ordinary Dividends")
-
-            self.push_sum('2_value', ['1_{}_value'.format(str(i)) for i in range(1, 15)])
-            self.push_to_dict('4_value', self.d.get('2_value', 0) - self.d.get('3_value', 0))
-            self.push_sum('6_value', ['5_{}_value'.format(str(i)) for i in range(1, 17)])
-
-            if 'foreign_account' in d:
-                self.d['7a_y'] = True
-                self.d['7a_yes_y'] = True
-                self.d['7b'] = d['foreign_account']
-                self.d['8_n'] = True
-
-    class Form1040sd(Form):
-        def __init__(self):
-            Form.__init__(self, k_1040sd)
-
-        def build(self):
-            self.push_name_ssn()
-
-            # short / long term gains
-            def fill_gains(ls_key, index):
-                self.push_to_dict('{}b_proceeds'.format(index), sum_trades[ls_key]['Proceeds'], 2)
-                self.push_to_dict('{}b_cost'.format(index), sum_trades[ls_key]['Cost'], 2)
-                self.push_to_dict('{}b_adjustments'.format(index), sum_trades[ls_key]['Adjustment'], 2)
-                self.push_to_dict('{}b_gain'.format(index), sum_trades[ls_key]['Gain'], 2)
-            fill_gains("SHORT", "1")
-            fill_gains("LONG", "8")
-
-            # fill capital loss carryover worksheet
-            capital_loss = CapitalLossCarryoverWorksheet()
-            capital_loss.build()
-            self.push_to_dict('6', -worksheets[w_capital_loss_carryover][8])
-            self.push_to_dict('14', -worksheets[w_capital_loss_carryover][13])
-
-            self.push_sum('7', ['1a_gain', '1b_gain', '2_gain', '3_gain', '4', '5', '6'])
-            self.push_sum('15', ['8a_gain', '8b_gain', '9_gain', '10_gain', '11', '12', '13', '14'])
-            self.push_sum('16', ['7', '15'])
-
-            self.revert_sign('6')
-            self.revert_sign('14')
-
-            if self.d['16'] < 0:
-                capital_loss_limit = 3000 if d['single'] else 1500
-                self.push_to_dict('21', min(capital_loss_limit, -self.d['16']))
-
-            if dividends_qualified > 0:
-                self.d['22_y'] = True
+standard_deduction = 12200  # if single or married filing separately
+qualified_business_deduction = 0
+
+
+class Return2019:
+    # state of one return, the form classes below are defined once and only hold the computations
+    def __init__(self, d, output_2018=None):
+        self.d = d
+        if output_2018 is not None:
+            self.states_2018, self.worksheets_all_2018 = output_2018
+        else:
+            self.states_2018, self.worksheets_all_2018 = None, None
+
+        self.main_info = get_main_info(d)
+        self.wages = sum(w['Wages'] for w in d['W2'])
+        self.federal_tax = sum(w['Federal_tax'] for w in d['W2'])
+        self.social_security_tax = sum(w['SocialSecurity_tax'] for w in d['W2'])
+        self.medicare_tax = sum(w['Medicare_tax'] for w in d['W2'])
+        self.state_tax = sum(w['State_tax'] for w in d['W2'])
+        self.local_tax = sum(w['Local_tax'] for w in d['W2'])
+
+        self.has_1099 = '1099' in d
+        self.dividends_qualified = None
+        self.additional_income = None
+
+        if self.has_1099:
+            self.n_trades = sum(len(i['Trades']) for i in d['1099'] if 'Trades' in i)
+            # additional_income = n_trades > 0
+            # from 8949 to fill 1040sd
+            self.sum_trades = {"SHORT": {"Proceeds": 0, "Cost": 0, "Adjustment": 0, "Gain": 0},
+                               "LONG": {"Proceeds": 0, "Cost": 0, "Adjustment": 0, "Gain": 0}}
+
+        self.forms_state = {}  # mapping name of forms with content
+        self.worksheets = {}  # worksheets need not be printed
+
+
+class Form:
+    def __init__(self, r, key):
+        self.r = r
+        self.key = key
+        self.d = {}
+        self.r.forms_state[self.key] = self.d
+
+    def push_to_dict(self, key, value, round_i=2):
+        if value != 0:
+            self.d[key] = round(value, round_i)
+
+    def push_name_ssn(self, prefix="", suffix=""):
+        self.d[prefix + 'name' + suffix] = self.r.forms_state[k_1040]['self_first_name_initial'] \
+                         + " " + self.r.forms_state[k_1040]['self_last_name']
+        self.d[prefix + 'ssn' + suffix] = self.r.main_info['ssn']
+
+    def push_sum(self, key, it):
+        self.d[key] = sum(self.d.get(k, 0) for k in it)
+
+    def revert_sign(self, key):
+        if key in self.d:
+            self.d[key] = -self.d[key]
+
+    def build(self):
+        raise NotImplementedError()
+
+
+class Form1040(Form):
+    def __init__(self, r):
+        Form.__init__(self, r, k_1040)
+
+    def build(self):
+        first_name_and_initial = self.r.main_info['first_name']
+        if self.r.main_info['initial'] != "":
+            first_name_and_initial += " " + self.r.main_info['initial']
+        self.d.update({
+            'single': True,
+            'self_first_name_initial': first_name_and_initial,
+            'self_last_name': self.r.main_info['last_name'],
+            'self_ssn': self.r.main_info['ssn'],
+            'address': self.r.main_info['address_street_and_number'],
+            'apt': self.r.main_info['address_apt'],
+            'city_state_zip': self.r.main_info['address_city_state_zip'],
+            'full_year_health_coverage_or_exempt': self.r.d['full_year_health_coverage_or_exempt'],
+            'presidential_election_self': self.r.d['presidential_election_self'],
+            'self_occupation': self.r.d['occupation'],
+            'phone': self.r.d['phone'],
+            'email': self.r.d['email'],
+        })
+
+        self.push_to_dict('1', self.r.wages)
+
+        if self.r.has_1099:
+            Form1040sb(self.r).build()
+            self.push_to_dict('2_b', self.r.forms_state[k_1040sb]['4_value'])
+            self.push_to_dict('3_b', self.r.forms_state[k_1040sb]['6_value'])
+
+            if self.r.forms_state[k_1040sb]['4_value'] == 0 \
+                    and self.r.forms_state[k_1040sb]['6_value'] == 0 \
+                    and 'foreign_account' not in self.r.d:
+                del self.r.forms_state[k_1040sb]
+
+            self.r.dividends_qualified = sum(i.get('Qualified Dividends', 0) for i in self.r.d['1099'])
+            self.push_to_dict('3_a', self.r.dividends_qualified)
+
+        self.d["6_n"] = not self.r.d['scheduleD']
+        if self.r.d['scheduleD']:
+            Form8949(self.r).build()  # build 8949 first
+            Form1040sd(self.r).build()
+            if '21' in self.r.forms_state[k_1040sd]:
+                self.push_to_dict('6_value', -self.r.forms_state[k_1040sd]['21'])
             else:
-                self.d['22_n'] = True
-
-    class Form6251(Form):
-        def __init__(self):
-            Form.__init__(self, k_6251)
-
-        def build(self):
-            self.push_name_ssn()
-
-    class Form8949(Form):  # may need several of them when many transactions
-        def __init__(self):
-            Form.__init__(self, k_8949)
-
-        def build(self):
-            def yield_trades(long_short, form_code):
-                for uu in d['1099']:
-                    if 'Trades' in uu:
-                        for tt in uu['Trades']:
-                            if long_short in tt['LongShort'] and form_code == tt['FormCode']:
-                                yield tt
-
-            # need a-b-c granularity here
-            # a means "Covered/Uncovered" == 'COVERED' --  "FormCode" == "A"
-            # b means "Covered/Uncovered" == 'UNCOVERED' --  "FormCode" == "B"
-
-            trades_subsets = []
-            trades_per_page_limit = 14
-            for code in ["A", "B", "C", "D", "E", "F"]:
-                trades_short = yield_trades(long_short='SHORT', form_code=code)
-                trades_long = yield_trades(long_short='LONG', form_code=code)
-                while True:
-                    trades = {
-                        'SHORT': list(islice(trades_short, trades_per_page_limit)),
-                        'LONG': list(islice(trades_long, trades_per_page_limit))
-                    }
-                    if len(trades['SHORT']) == 0 and len(trades['LONG']) == 0:
-                        break
-                    trades_subsets.append((code, trades))
-
-            # accumulate the proceeds/cost/adjustment/gain for 1040sd
-
-            if len(trades_subsets) == 1:
-                # if few enough trades
-                forms_state[k_8949] = self.build_one(trades_subsets[0])
+                self.push_to_dict('6_value', self.r.forms_state[k_1040sd]['16'])
+
+        # if additional_income:
+            # need line 22 from schedule 1
+            # Form1040s1(self.r).build()
+            # self.push_to_dict('6_from_s1_22', forms_state[k_1040s1]['22_dollar'])
+
+        self.push_sum('7_b', ['1', '2_b', '3_b', '4_b', '4_d', '5_b', '6_value', '7_a'])  # total income
+
+        if self.r.additional_income:
+            self.push_to_dict('8_a', self.r.forms_state[k_1040s1].get('22', 0))
+
+        self.push_to_dict('8_b', self.d['7_b'] - self.d.get('8_a', 0))  # Adjusted Gross Income
+
+        self.push_to_dict('9', standard_deduction)
+        self.push_to_dict('10', qualified_business_deduction)
+        self.push_sum('11_a', ['9', '10'])
+        self.push_to_dict('11_b', max(0, self.d.get('8_b', 0) - self.d.get('11_a', 0)))  # Taxable income
+
+        if self.r.dividends_qualified:
+            qualified_dividend_worksheet = QualifiedDividendsCapitalGainTaxWorksheet(self.r)
+            qualified_dividend_worksheet.build()
+            self.push_to_dict('12_a', self.r.worksheets[w_qualified_dividends_and_capital_gains][27])
+        else:
+            self.push_to_dict('12_a', computation(self.d['11_b']))
+
+        # # add from 11b
+        # should_fill = ShouldFill6251Worksheet(self.r)
+        # should_fill.build()
+        # awt = 0
+        # if should_fill.fill6251:
+        #     Form1040s2(self.r).build()
+        #     Form6251(self.r).build()
+        #     awt = forms_state[k_6251]['11_dollar']
+        # if awt > 0:
+        #     self.d['11b'] = True
+        #     self.push_to_dict('11_dollar', self.d['11a_tax'] + awt)
+        # else:
+        #     self.push_sum('11_dollar', ['11a_tax'])
+        # if has_1099:
+        #     Form1040s3(self.r).build()
+        #     foreign_tax = forms_state[k_1040s3]['55_dollar']
+        #     if foreign_tax != 0:
+        #         self.d['12b'] = True
+        #         self.push_to_dict('12_dollar', forms_state[k_1040s3]['55_dollar'])
+        #     else:
+        #         del forms_state[k_1040s3]
+
+        self.push_sum('12_b', ['12_a'])  # plus schedule 2 line 3
+        self.push_to_dict('13_a', 0)  # child tax credit
+        self.push_sum('13_b', ['13_a'])  # plus schedule 3 line 7
+        self.push_to_dict('14', max(0, self.d.get('12_b', 0) - self.d.get('13_b', 0)))
+        self.push_to_dict('15', 0)  # other taxes from Schedule 2 line 10
+        self.push_sum('16', ['14', '15'])  # total tax
+        self.push_to_dict('17', self.r.federal_tax)
+
+        self.push_to_dict('18_a', 0)  # Earned Income Credit
+        self.push_to_dict('18_b', 0)  # Additional child tax Credit
+        self.push_to_dict('18_c', 0)  # American opportunity credit Form 8863, line 8
+        self.push_to_dict('18_d', 0)  # Schedule 3, line 14
+        self.push_sum('18_e', ['18_a', '18_b', '18_c', '18_d'])  # total other payments and refundable credit
+
+        self.push_sum('19', ['17', '18_e'])  # total payments
+
+        # refund
+        overpaid = self.d['19'] - self.d['16']
+        if overpaid > 0:
+            self.push_to_dict('20', overpaid)
+            # all refunded
+            self.push_to_dict('21a_value', overpaid)
+            self.d['21b'] = self.r.d['routing_number']
+            if self.r.d['checking']:
+                self.d['21c_checking'] = True
             else:
-                # if many -> use a list of content dictionaries
-                ll = [self.build_one(l) for l in trades_subsets]
-                forms_state[k_8949] = ll
-
-        def build_one(self, code_trades):
-            code, trades = code_trades
-            self.d = {}
-            self.push_name_ssn(prefix="I_")
-            self.push_name_ssn(prefix="II_")
-
-            def fill_trades(ls_key, check_key, index):
-                if len(trades[ls_key]) > 0:
-                    self.d[check_key] = True
-                    s_proceeds, s_cost, s_adj, s_gain = 0, 0, 0, 0
-                    for i, t in enumerate(trades[ls_key], 1):
-                        self.d['{}_1_{}_description'.format(index, str(i))] = t['SalesDescription']
-                        self.d['{}_1_{}_date_acq'.format(index, str(i))] = t['DateAcquired']
-                        self.d['{}_1_{}_date_sold'.format(index, str(i))] = t['DateSold']
-
-                        proceeds = t['Proceeds']
-                        self.push_to_dict('{}_1_{}_proceeds'.format(index, str(i)), proceeds, 2)
-                        cost = t['Cost']
-                        self.push_to_dict('{}_1_{}_cost'.format(index, str(i)), cost, 2)
-
-                        if 'WashSaleValue' in t:
-                            adj = t['WashSaleValue']
-                            self.push_to_dict('{}_1_{}_adjustment'.format(index, str(i)), adj, 2)
-                            self.d['{}_1_{}_code'.format(index, str(i))] = t['WashSaleCode']
-                        else:
-                            adj = 0
-
-                        gain = proceeds - cost + adj
-                        self.push_to_dict('{}_1_{}_gain'.format(index, str(i)), gain, 2)
-
-                        s_proceeds += proceeds
-                        s_cost += cost
-                        s_adj += adj
-                        s_gain += gain
-
-                    self.push_to_dict('{}_2_proceeds'.format(index), s_proceeds, 2)
-                    self.push_to_dict('{}_2_cost'.format(index), s_cost, 2)
-                    self.push_to_dict('{}_2_adjustment'.format(index), s_adj, 2)
-                    self.push_to_dict('{}_2_gain'.format(index), s_gain, 2)
-
-                    sum_trades[ls_key]['Proceeds'] += s_proceeds
-                    sum_trades[ls_key]['Cost'] += s_cost
-                    sum_trades[ls_key]['Adjustment'] += s_adj
-                    sum_trades[ls_key]['Gain'] += s_gain
-
-            # code is A, B, or C
-
-            fill_trades('SHORT', f'short_{code.lower()}', 'I')
-            fill_trades('LONG', f'long_{code.lower()}', 'II')
-            return self.d.copy()
-
-    class Worksheet:
-        def __init__(self, key, n):
-            self.key = key
-            self.d = [0 for i in range(n + 1)]
-            worksheets[self.key] = self.d
-
-        def build(self):
-            raise NotImplementedError()
-
-    class CapitalLossCarryoverWorksheet(Worksheet):
-        def __init__(self):
-            Worksheet.__init__(self, w_capital_loss_carryover, 13)
-
-        def build(self):
-            ddd = d
-            fff = forms_state
-            www = worksheets
-            self.d[1] = states_2018[k_1040]['10_dollar']
-            self.d[2] = max(0, states_2018[k_1040sd]['21'])
-            self.d[3] = max(0, self.d[1] + self.d[2])
-            self.d[4] = min(self.d[2], self.d[3])
-            self.d[5] = max(0, -states_2018[k_1040sd]['7'])
-            self.d[6] = max(0, states_2018[k_1040sd]['15'])
-            self.d[7] = self.d[4] + self.d[6]
-            self.d[8] = max(0, self.d[5] - self.d[7])
-            if self.d[6] == 0:
-                self.d[9] = max(0, -states_2018[k_1040sd]['15'])
-                self.d[10] = max(0, states_2018[k_1040sd]['7'])
-                self.d[11] = max(0, self.d[4] - self.d[5])
-                self.d[12] = self.d[10] + self.d[11]
-                self.d[13] = max(0, self.d[9] - self.d[12])
-
-    class QualifiedDividendsCapitalGainTaxWorksheet(Worksheet):
-        def __init__(self):
-            Worksheet.__init__(self, w_qualified_dividends_and_capital_gains, 27)
-
-        def build(self):
-            self.d[1] = forms_state[k_1040]['10_dollar']
-            self.d[2] = forms_state[k_1040]['3a_dollar']
-            if d['scheduleD']:
-                self.d[3] = max(0, min(forms_state[k_1040sd]['15'], forms_state[k_1040sd]['16']))
-            else:
-                self.d[3] = forms_state[k_1040s1]['13_dollar']
-            self.d[4] = self.d[2] + self.d[3]
-            self.d[5] = 0  # form 4952
-            self.d[6] = max(0, self.d[4] - self.d[5])
-            self.d[7] = max(0, self.d[1] - self.d[6])
-            self.d[8] = 38600 if d['single'] else 77200
-            self.d[9] = min(self.d[1], self.d[8])
-            self.d[10] = min(self.d[7], self.d[9])
-            self.d[11] = self.d[9] - self.d[10]  # taxed at 0%
-            self.d[12] = min(self.d[1], self.d[6])
-            self.d[13] = self.d[11]
-            self.d[14] = self.d[12] - self.d[13]
-            self.d[15] = 425800  # for single
-            self.d[16] = min(self.d[1], self.d[15])
-            self.d[17] = self.d[7] + self.d[11]
-            self.d[18] = max(0, self.d[16] - self.d[17])
-            self.d[19] = min(self.d[14], self.d[18])
-            self.d[20] = self.d[19] * 0.15
-            self.d[21] = self.d[11] + self.d[19]
-            self.d[22] = self.d[12] - self.d[21]
-            self.d[23] = self.d[22] * 0.2
-            self.d[24] = computation(self.d[7])
-            self.d[25] = self.d[20] + self.d[23] + self.d[24]
-            self.d[26] = computation(self.d[1])
-            self.d[27] = min(self.d[25], self.d[26])
-
-    class ShouldFill6251Worksheet(Worksheet):
-        def __init__(self):
-            Worksheet.__init__(self, w_should_fill_6251, 13)
-            self.fill6251 = None
-
-        def build(self):
-            if k_1040sa in forms_state:
-                self.d[1] = forms_state[k_1040]['10_dollar']
-                self.d[2] = forms_state[k_1040sa]['7']
-                self.d[3] = self.d[1] + self.d[2]
-            self.d[4] = forms_state[k_1040s1].get('10_dollar', 0) \
-                + forms_state[k_1040s1].get('21_dollar', 0) \
-                if k_1040s1 in forms_state else 0
-            self.d[5] = self.d[3] - self.d[4]
-            self.d[6] = 70300  # single
-            if self.d[5] <= self.d[6]:
-                self.fill6251 = False
-                return
-            self.d[7] = self.d[5] - self.d[6]
-            self.d[8] = 500000  # single
-            if self.d[5] <= self.d[8]:
-                self.d[9] = 0
-                self.d[11] = self.d[7]
-            else:
-                self.d[9] = self.d[5] - self.d[8]
-                self.d[10] = min(self.d[9] * 0.25, self.d[6])
-                self.d[11] = self.d[7] + self.d[10]
-            if self.d[11] >= 191100:  # single
-                self.fill6251 = True
-                return
-            self.d[12] = self.d[11] * 0.26
-            self.d[13] = forms_state[k_1040]['11a'] \
-                + forms_state[k_1040s2]['46']
-            self.fill6251 = (self.d[13] < self.d[12])
+                self.d['21c_savings'] = True
+            self.d['21d'] = self.r.d['account_number']
+            self.d['22'] = "-0-"
+        else:
+            self.push_to_dict('23', -overpaid)
+            self.push_to_dict('24', 0)
+
+
+class Form1040NR(Form):
+    def __init__(self, r):
+        Form.__init__(self, r, k_1040nr)
+
+
+class Form1040s1(Form):
+    def __init__(self, r):
+        Form.__init__(self, r, k_1040s1)
+
+    def build(self):
+        self.push_name_ssn()
+        # capital gains
+        if self.r.n_trades > 0:
+            if not self.r.d['scheduleD']:
+                self.push_to_dict('13_not_d', False)
+            if k_1040sd not in self.r.forms_state:
+                Form8949(self.r).build()  # build 8949 first
+                Form1040sd(self.r).build()
+
+        gains = self.r.forms_state[k_1040sd]['16']
+        if gains >= 0:
+            self.push_to_dict('13_dollar', gains)
+        else:
+            self.push_to_dict('13_dollar', -self.r.forms_state[k_1040sd]['21'])
+        self.push_sum('22_dollar',
+                      ['1_9b_dollar',
+                       *[str(i) + "_dollar"
+                         for i in range(10, 22)]
+                       ])
+
+
+class Form1040s2(Form):
+    def __init__(self, r):
+        Form.__init__(self, r, k_1040s2)
+
+    def build(self):
+        self.push_name_ssn()
+
+
+class Form1040s3(Form):
+    def __init__(self, r):
+        Form.__init__(self, r, k_1040s3)
+
+    def build(self):
+        self.push_name_ssn()
+        # I don't need the 1116
+        # https://turbotax.intuit.com/tax-tips/military/filing-irs-form-1116-to-claim-the-foreign-tax-credit/L2ODfqp89
+        foreign_tax = sum(i.get('Foreign Tax', 0) for i in self.r.d['1099'])
+        self.push_to_dict('48_dollar', foreign_tax)
+        self.push_sum('55_dollar', [str(i) + "_dollar" for i in range(48, 55)])
+
+
+class Form1040sb(Form):
+    def __init__(self, r):
+        Form.__init__(self, r, k_1040sb)
+
+    def build(self):
+        self.push_name_ssn()
+
+        if len(self.r.d['1099']) > 14:
+            logger.error("1040sb - too many brokers")
+
+        def fill_value(index, key):
+            i = 1
+            for f in self.r.d['1099']:
+                if key in f and f[key] != 0:
+                    self.d["{}_{}_payer".format(index, str(i))] = f['Institution']
+                    self.push_to_dict("{}_{}_value".format(index, str(i)), f[key])
+                    i += 1
+        fill_value("1", "Interest")
+        fill_value("5", "Ordinary Dividends")
+
+        self.push_sum('2_value', ['1_{}_value'.format(str(i)) for i in range(1, 15)])
+        self.push_to_dict('4_value', self.d.get('2_value', 0) - self.d.get('3_value', 0))
+        self.push_sum('6_value', ['5_{}_value'.format(str(i)) for i in range(1, 17)])
+
+        if 'foreign_account' in self.r.d:
+            self.d['7a_y'] = True
+            self.d['7a_yes_y'] = True
+            self.d['7b'] = self.r.d['foreign_account']
+            self.d['8_n'] = True
+
+
+class Form1040sd(Form):
+    def __init__(self, r):
+        Form.__init__(self, r, k_1040sd)
+
+    def build(self):
+        self.push_name_ssn()
+
+        # short / long term gains
+        def fill_gains(ls_key, index):
+            self.push_to_dict('{}b_proceeds'.format(index), self.r.sum_trades[ls_key]['Proceeds'], 2)
+            self.push_to_dict('{}b_cost'.format(index), self.r.sum_trades[ls_key]['Cost'], 2)
+            self.push_to_dict('{}b_adjustments'.format(index), self.r.sum_trades[ls_key]['Adjustment'], 2)
+            self.push_to_dict('{}b_gain'.format(index), self.r.sum_trades[ls_key]['Gain'], 2)
+        fill_gains("SHORT", "1")
+        fill_gains("LONG", "8")
+
+        # fill capital loss carryover worksheet
+        capital_loss = CapitalLossCarryoverWorksheet(self.r)
+        capital_loss.build()
+        self.push_to_dict('6', -self.r.worksheets[w_capital_loss_carryover][8])
+        self.push_to_dict('14', -self.r.worksheets[w_capital_loss_carryover][13])
+
+        self.push_sum('7', ['1a_gain', '1b_gain', '2_gain', '3_gain', '4', '5', '6'])
+        self.push_sum('15', ['8a_gain', '8b_gain', '9_gain', '10_gain', '11', '12', '13', '14'])
+        self.push_sum('16', ['7', '15'])
+
+        self.revert_sign('6')
+        self.revert_sign('14')
+
+        if self.d['16'] < 0:
+            capital_loss_limit = 3000 if self.r.d['single'] else 1500
+            self.push_to_dict('21', min(capital_loss_limit, -self.d['16']))
+
+        if self.r.dividends_qualified > 0:
+            self.d['22_y'] = True
+        else:
+            self.d['22_n'] = True
+
+
+class Form6251(Form):
+    def __init__(self, r):
+        Form.__init__(self, r, k_6251)
+
+    def build(self):
+        self.push_name_ssn()
+
+
+class Form8949(Form):  # may need several of them when many transactions
+    def __init__(self, r):
+        Form.__init__(self, r, k_8949)
+
+    def build(self):
+        def yield_trades(long_short, form_code):
+            for uu in self.r.d['1099']:
+                if 'Trades' in uu:
+                    for tt in uu['Trades']:
+                        if long_short in tt['LongShort'] and form_code == tt['FormCode']:
+                            yield tt
+
+        # need a-b-c granularity here
+        # a means "Covered/Uncovered" == 'COVERED' --  "FormCode" == "A"
+        # b means "Covered/Uncovered" == 'UNCOVERED' --  "FormCode" == "B"
+
+        trades_subsets = []
+        trades_per_page_limit = 14
+        for code in ["A", "B", "C", "D", "E", "F"]:
+            trades_short = yield_trades(long_short='SHORT', form_code=code)
+            trades_long = yield_trades(long_short='LONG', form_code=code)
+            while True:
+                trades = {
+                    'SHORT': list(islice(trades_short, trades_per_page_limit)),
+                    'LONG': list(islice(trades_long, trades_per_page_limit))
+                }
+                if len(trades['SHORT']) == 0 and len(trades['LONG']) == 0:
+                    break
+                trades_subsets.append((code, trades))
+
+        # accumulate the proceeds/cost/adjustment/gain for 1040sd
+
+        if len(trades_subsets) == 1:
+            # if few enough trades
+            self.r.forms_state[k_8949] = self.build_one(trades_subsets[0])
+        else:
+            # if many -> use a list of content dictionaries
+            ll = [self.build_one(l) for l in trades_subsets]
+            self.r.forms_state[k_8949] = ll
+
+    def build_one(self, code_trades):
+        code, trades = code_trades
+        self.d = {}
+        self.push_name_ssn(prefix="I_")
+        self.push_name_ssn(prefix="II_")
+
+        def fill_trades(ls_key, check_key, index):
+            if len(trades[ls_key]) > 0:
+                self.d[check_key] = True
+                s_proceeds, s_cost, s_adj, s_gain = 0, 0, 0, 0
+                for i, t in enumerate(trades[ls_key], 1):
+                    self.d['{}_1_{}_description'.format(index, str(i))] = t['SalesDescription']
+                    self.d['{}_1_{}_date_acq'.format(index, str(i))] = t['DateAcquired']
+                    self.d['{}_1_{}_date_sold'.format(index, str(i))] = t['DateSold']
+
+                    proceeds = t['Proceeds']
+                    self.push_to_dict('{}_1_{}_proceeds'.format(index, str(i)), proceeds, 2)
+                    cost = t['Cost']
+                    self.push_to_dict('{}_1_{}_cost'.format(index, str(i)), cost, 2)
+
+                    if 'WashSaleValue' in t:
+                        adj = t['WashSaleValue']
+                        self.push_to_dict('{}_1_{}_adjustment'.format(index, str(i)), adj, 2)
+                        self.d['{}_1_{}_code'.format(index, str(i))] = t['WashSaleCode']
+                    else:
+                        adj = 0
+
+                    gain = proceeds - cost + adj
+                    self.push_to_dict('{}_1_{}_gain'.format(index, str(i)), gain, 2)
+
+                    s_proceeds += proceeds
+                    s_cost += cost
+                    s_adj += adj
+                    s_gain += gain
+
+                self.push_to_dict('{}_2_proceeds'.format(index), s_proceeds, 2)
+                self.push_to_dict('{}_2_cost'.format(index), s_cost, 2)
+                self.push_to_dict('{}_2_adjustment'.format(index), s_adj, 2)
+                self.push_to_dict('{}_2_gain'.format(index), s_gain, 2)
+
+                self.r.sum_trades[ls_key]['Proceeds'] += s_proceeds
+                self.r.sum_trades[ls_key]['Cost'] += s_cost
+                self.r.sum_trades[ls_key]['Adjustment'] += s_adj
+                self.r.sum_trades[ls_key]['Gain'] += s_gain
+
+        # code is A, B, or C
+
+        fill_trades('SHORT', f'short_{code.lower()}', 'I')
+        fill_trades('LONG', f'long_{code.lower()}', 'II')
+        return self.d.copy()
+
+
+class Worksheet:
+    def __init__(self, r, key, n):
+        self.r = r
+        self.key = key
+        self.d = [0 for i in range(n + 1)]
+        self.r.worksheets[self.key] = self.d
+
+    def build(self):
+        raise NotImplementedError()
+
+
+class CapitalLossCarryoverWorksheet(Worksheet):
+    def __init__(self, r):
+        Worksheet.__init__(self, r, w_capital_loss_carryover, 13)
+
+    def build(self):
+        self.d[1] = self.r.states_2018[k_1040]['10_dollar']
+        self.d[2] = max(0, self.r.states_2018[k_1040sd].get('21', 0))
+        self.d[3] = max(0, self.d[1] + self.d[2])
+        self.d[4] = min(self.d[2], self.d[3])
+        self.d[5] = max(0, -self.r.states_2018[k_1040sd]['7'])
+        self.d[6] = max(0, self.r.states_2018[k_1040sd]['15'])
+        self.d[7] = self.d[4] + self.d[6]
+        self.d[8] = max(0, self.d[5] - self.d[7])
+        if self.d[6] == 0:
+            self.d[9] = max(0, -self.r.states_2018[k_1040sd]['15'])
+            self.d[10] = max(0, self.r.states_2018[k_1040sd]['7'])
+            self.d[11] = max(0, self.d[4] - self.d[5])
+            self.d[12] = self.d[10] + self.d[11]
+            self.d[13] = max(0, self.d[9] - self.d[12])
+
+
+class QualifiedDividendsCapitalGainTaxWorksheet(Worksheet):
+    def __init__(self, r):
+        Worksheet.__init__(self, r, w_qualified_dividends_and_capital_gains, 27)
+
+    def build(self):
+        self.d[1] = self.r.forms_state[k_1040]['11_b']
+        self.d[2] = self.r.forms_state[k_1040]['3_a']
+        if self.r.d['scheduleD']:
+            self.d[3] = max(0, min(self.r.forms_state[k_1040sd]['15'], self.r.forms_state[k_1040sd]['16']))
+        else:
+            self.d[3] = self.r.forms_state[k_1040s1]['13_dollar']
+        self.d[4] = self.d[2] + self.d[3]
+        self.d[5] = 0  # form 4952
+        self.d[6] = max(0, self.d[4] - self.d[5])
+        self.d[7] = max(0, self.d[1] - self.d[6])
+        self.d[8] = 38600 if self.r.d['single'] else 77200
+        self.d[9] = min(self.d[1], self.d[8])
+        self.d[10] = min(self.d[7], self.d[9])
+        self.d[11] = self.d[9] - self.d[10]  # taxed at 0%
+        self.d[12] = min(self.d[1], self.d[6])
+        self.d[13] = self.d[11]
+        self.d[14] = self.d[12] - self.d[13]
+        self.d[15] = 425800  # for single
+        self.d[16] = min(self.d[1], self.d[15])
+        self.d[17] = self.d[7] + self.d[11]
+        self.d[18] = max(0, self.d[16] - self.d[17])
+        self.d[19] = min(self.d[14], self.d[18])
+        self.d[20] = self.d[19] * 0.15
+        self.d[21] = self.d[11] + self.d[19]
+        self.d[22] = self.d[12] - self.d[21]
+        self.d[23] = self.d[22] * 0.2
+        self.d[24] = computation(self.d[7])
+        self.d[25] = self.d[20] + self.d[23] + self.d[24]
+        self.d[26] = computation(self.d[1])
+        self.d[27] = min(self.d[25], self.d[26])
+
+
+class ShouldFill6251Worksheet(Worksheet):
+    def __init__(self, r):
+        Worksheet.__init__(self, r, w_should_fill_6251, 13)
+        self.fill6251 = None
+
+    def build(self):
+        if k_1040sa in self.r.forms_state:
+            self.d[1] = self.r.forms_state[k_1040]['10_dollar']
+            self.d[2] = self.r.forms_state[k_1040sa]['7']
+            self.d[3] = self.d[1] + self.d[2]
+        self.d[4] = self.r.forms_state[k_1040s1].get('10_dollar', 0) \
+            + self.r.forms_state[k_1040s1].get('21_dollar', 0) \
+            if k_1040s1 in self.r.forms_state else 0
+        self.d[5] = self.d[3] - self.d[4]
+        self.d[6] = 70300  # single
+        if self.d[5] <= self.d[6]:
+            self.fill6251 = False
+            return
+        self.d[7] = self.d[5] - self.d[6]
+        self.d[8] = 500000  # single
+        if self.d[5] <= self.d[8]:
+            self.d[9] = 0
+            self.d[11] = self.d[7]
+        else:
+            self.d[9] = self.d[5] - self.d[8]
+            self.d[10] = min(self.d[9] * 0.25, self.d[6])
+            self.d[11] = self.d[7] + self.d[10]
+        if self.d[11] >= 191100:  # single
+            self.fill6251 = True
+            return
+        self.d[12] = self.d[11] * 0.26
+        self.d[13] = self.r.forms_state[k_1040]['11a'] \
+            + self.r.forms_state[k_1040s2]['46']
+        self.fill6251 = (self.d[13] < self.d[12])
 
+
+def fill_taxes_2019(d, output_2018=None):
+    r = Return2019(d, output_2018)
     if d['resident']:
-        Form1040().build()  # one other version for NR
+        Form1040(r).build()  # one other version for NR
     else:
         logger.error("Non-resident not yet implemented")
-        # Form1040NR().build()  # one other version for NR
-    return forms_state, worksheets
+        # Form1040NR(r).build()  # one other version for NR
+    return r.forms_state, r.worksheets
@@ -0,0 +1,127 @@
+# field values without the pdf: FDF and XFDF documents, a few KB per form
+# the field names are the fully qualified ones of the blank form, from its template index
+# a reader (or pdftk fill_form) applies them to the blank form referenced by /F (FDF) or <f href> (XFDF)
+import os
+import xml.etree.ElementTree as ET
+import pdfrw
+from utils.forms_constants import ANNOT_FIELD_TYPE_BTN, ANNOT_FIELD_TYPE_TXT, fdf_extension, xfdf_extension, \
+    logger
+from utils.forms_utils import template_cache, field_text
+
+xfdf_namespace = "http://ns.adobe.com/xfdf/"
+ET.register_namespace('', xfdf_namespace)
+
+
+def form_values(file, d):
+    # d maps the annotation fields to values, like fill_pdf
+    # returns fully qualified name -> (field type, value), a checked box has the name of its checked state
+    index = template_cache.index(file)
+    values = {}
+    for key, r in d.items():
+        field = index.get(key)
+        if field is None:
+            continue
+        if field['type'] == ANNOT_FIELD_TYPE_BTN:
+            value = field['widgets'][0][3][1:] if r else 'Off'  # '/1' -> 1
+        elif field['type'] == ANNOT_FIELD_TYPE_TXT:
+            value = field_text(r)
+        else:
+            continue
+        for name in field['names']:
+            values[name] = field['type'], value
+    return values
+
+
+def form_pages_values(file, d_list):
+    # same names as fill_pdf_pages, the fields of copy i under <form>_<i>
+    form = os.path.splitext(os.path.basename(file))[0]
+    values = {}
+    for i, d in enumerate(d_list):
+        values.update({f"{form}_{i}.{k}": v for k, v in form_values(file, d).items()})
+    return values
+
+
+def top_names(file, pages=None):
+    # top level fields of the form, or of fill_pdf_pages with that many pages
+    if pages is not None:
+        form = os.path.splitext(os.path.basename(file))[0]
+        return {f"{form}_{i}" for i in range(pages)}
+    return {name.split('.')[0] for field in template_cache.index(file).values() for name in field['names']}
+
+
+def merge_values(documents):
+    # documents is a list of (name, values, top level fields of the form), same names as merge_forms:
+    # top level fields already taken by a previous document go under a root field with the name of the document
+    values = {}
+    field_names = set()
+    for name, document, tops in documents:
+        taken = tops & field_names
+        root_name = name
+        i = 1
+        while taken and root_name in field_names:
+            root_name = f"{name}_{i}"
+            i += 1
+        for k, v in document.items():
+            values[f"{root_name}.{k}" if k.split('.')[0] in taken else k] = v
+        field_names |= tops - taken
+        if taken:
+            field_names.add(root_name)
+    return values
+
+
+def values_tree(values):
+    # fully qualified names to nested fields: {'topmostSubform[0]': {'Page1[0]': {'f1_01[0]': value}}}
+    tree = {}
+    for name, value in values.items():
+        *parents, leaf = name.split('.')
+        node = tree
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = value
+    return tree
+
+
+def fdf_fields(tree):
+    fields = []
+    for name, node in tree.items():
+        if isinstance(node, dict):
+            fields.append(f"<< /T {pdfrw.PdfString.encode(name)} /Kids [{fdf_fields(node)}] >>")
+        else:
+            field_type, value = node
+            value = pdfrw.PdfName(value) if field_type == ANNOT_FIELD_TYPE_BTN else pdfrw.PdfString.encode(value)
+            fields.append(f"<< /T {pdfrw.PdfString.encode(name)} /V {value} >>")
+    return "\n".join(fields)
+
+
+def write_fdf(out_file, values, pdf_file=None):
+    # pdf_file is the form the values are for, relative to the fdf file
+    file_spec = f" /F {pdfrw.PdfString.encode(pdf_file.replace(os.sep, '/'))}" if pdf_file else ""
+    with open(out_file, 'wb') as f:
+        f.write(b"%FDF-1.2\n%\xe2\xe3\xcf\xd3\n")
+        f.write(f"1 0 obj\n<< /FDF << /Fields [\n{fdf_fields(values_tree(values))}\n]{file_spec} >> >>\n"
+                f"endobj\ntrailer\n<< /Root 1 0 R >>\n%%EOF\n".encode('latin-1'))
+    logger.info("Exporting FDF file %s succeeded", out_file)
+
+
+def xfdf_fields(parent, tree):
+    for name, node in tree.items():
+        field = ET.SubElement(parent, f"{{{xfdf_namespace}}}field", name=name)
+        if isinstance(node, dict):
+            xfdf_fields(field, node)
+        else:
+            ET.SubElement(field, f"{{{xfdf_namespace}}}value").text = node[1]
+
+
+def write_xfdf(out_file, values, pdf_file=None):
+    root = ET.Element(f"{{{xfdf_namespace}}}xfdf", {"{http://www.w3.org/XML/1998/namespace}space": "preserve"})
+    if pdf_file:
+        ET.SubElement(root, f"{{{xfdf_namespace}}}f", href=pdf_file.replace(os.sep, '/'))
+    xfdf_fields(ET.SubElement(root, f"{{{xfdf_namespace}}}fields"), values_tree(values))
+    ET.ElementTree(root).write(out_file, encoding='UTF-8', xml_declaration=True)
+    logger.info("Exporting XFDF file %s succeeded", out_file)
+
+
+field_writers = {
+    fdf_extension: write_fdf,
+    xfdf_extension: write_xfdf,
+}
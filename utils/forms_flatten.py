@@ -0,0 +1,124 @@
+# flattened forms: the values are drawn in the page content and the widgets are removed
+# so the pdf prints the same everywhere (print services ignore the annotations)
+# text is written with one standard Helvetica font object shared by all the pages, nothing embedded
+# checked boxes reuse the appearance stream of the blank form
+import re
+import pdfrw
+from pdfrw import PdfName
+from pdfminer.fontmetrics import FONT_METRICS
+from utils.forms_constants import ANNOT_KEY, ANNOT_FIELD_TYPE_KEY, ANNOT_FIELD_TYPE_TXT, ANNOT_FIELD_TYPE_BTN, \
+    ANNOT_VAL_KEY, ANNOT_RECT_KEY, SUBTYPE_KEY, WIDGET_SUBTYPE_KEY
+
+flatten_font_name = PdfName('FillFont')
+flatten_font = pdfrw.IndirectPdfDict(
+    Type=PdfName.Font, Subtype=PdfName.Type1, BaseFont=PdfName.Helvetica, Encoding=PdfName.WinAnsiEncoding)
+flatten_font_widths = FONT_METRICS['Helvetica'][1]
+flatten_font_size = 8  # when the field has an automatic size (0 Tf)
+flatten_color = "0 0 0.502 rg"  # same dark blue as the fields of the IRS forms
+comb_flag = 1 << 24  # Ff bit 25, text spread in MaxLen cells
+
+save_state = pdfrw.IndirectPdfDict()
+save_state.stream = "q\n"
+
+
+def inherited(annotation, key):
+    while annotation is not None:
+        if annotation[key] is not None:
+            return annotation[key]
+        annotation = annotation.Parent
+    return None
+
+
+def text_width(text, size):
+    return sum(flatten_font_widths.get(c, 556) for c in text) * size / 1000
+
+
+def escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def text_value(value):
+    if hasattr(value, 'decode'):
+        return value.decode()
+    return str(value)
+
+
+def draw_text(annotation, text):
+    x1, y1, x2, y2 = (float(u) for u in annotation[ANNOT_RECT_KEY])
+    x1, x2 = min(x1, x2), max(x1, x2)
+    y1, y2 = min(y1, y2), max(y1, y2)
+    width, height = x2 - x1, y2 - y1
+    da = inherited(annotation, '/DA')
+    size = re.search(r'([\d.]+)\s+Tf', da.decode() if da is not None else "")
+    size = float(size.group(1)) if size and float(size.group(1)) > 0 else flatten_font_size
+    size = min(size, height)
+    baseline = y1 + (height - size * 0.7) / 2
+
+    flags = int(inherited(annotation, '/Ff') or 0)
+    max_length = inherited(annotation, '/MaxLen')
+    if flags & comb_flag and max_length:
+        cell = width / int(max_length)
+        return "".join(
+            f"BT /{flatten_font_name[1:]} {size:.2f} Tf "
+            f"{x1 + cell * i + (cell - text_width(c, size)) / 2:.2f} {baseline:.2f} Td ({escape(c)}) Tj ET\n"
+            for i, c in enumerate(text))
+
+    if text_width(text, size) > width - 2:
+        size = size * (width - 2) / text_width(text, size)
+    alignment = int(inherited(annotation, '/Q') or 0)  # 0 left, 1 center, 2 right
+    x = x1 + 2 + (width - 4 - text_width(text, size)) * alignment / 2
+    return f"BT /{flatten_font_name[1:]} {size:.2f} Tf {x:.2f} {baseline:.2f} Td ({escape(text)}) Tj ET\n"
+
+
+def flatten_page(page):
+    # values of the widgets drawn at the end of the page content, the other annotations are kept
+    if page[ANNOT_KEY] is None:
+        return
+    commands = []
+    x_objects = {}
+    annotations = pdfrw.PdfArray()
+    for annotation in page[ANNOT_KEY]:
+        if annotation[SUBTYPE_KEY] != WIDGET_SUBTYPE_KEY:
+            annotations.append(annotation)
+            continue
+        field_type = inherited(annotation, ANNOT_FIELD_TYPE_KEY)
+        if field_type == ANNOT_FIELD_TYPE_TXT:
+            value = inherited(annotation, ANNOT_VAL_KEY)
+            if value is not None and text_value(value) != "":
+                commands.append(draw_text(annotation, text_value(value)))
+        elif field_type == ANNOT_FIELD_TYPE_BTN:
+            state = annotation.AS
+            if state is not None and state != PdfName.Off and annotation.AP and annotation.AP.N \
+                    and annotation.AP.N[state] is not None:
+                name = f"FillBox{len(x_objects)}"
+                x_objects[PdfName(name)] = annotation.AP.N[state]
+                x1, y1, x2, y2 = (float(u) for u in annotation[ANNOT_RECT_KEY])
+                x1, y1 = min(x1, x2), min(y1, y2)
+                commands.append(f"q 1 0 0 1 {x1:.2f} {y1:.2f} cm /{name} Do Q\n")
+    page.Annots = annotations or None
+    if not commands:
+        return
+
+    # resources of the page may be shared with other pages (f8949 copies), new dictionaries are made
+    resources = pdfrw.PdfDict(page.inheritable.Resources or {})
+    fonts = pdfrw.PdfDict(resources.Font or {})
+    fonts[flatten_font_name] = flatten_font
+    resources.Font = fonts
+    if x_objects:
+        resources.XObject = pdfrw.PdfDict(resources.XObject or {}, **{k[1:]: v for k, v in x_objects.items()})
+    page.Resources = resources
+
+    # the original content is wrapped in q Q so its graphic state does not move the values
+    contents = page.Contents
+    contents = list(contents) if isinstance(contents, pdfrw.PdfArray) else [contents]
+    values = pdfrw.IndirectPdfDict()
+    values.stream = f"Q\nq {flatten_color}\n" + "".join(commands) + "Q\n"
+    page.Contents = pdfrw.PdfArray([save_state] + contents + [values])
+
+
+def flatten_pdf(pdf):
+    # pdf is a filled form (fill_pdf, fill_pdf_pages), flattened in place
+    for page in pdf.pages:
+        flatten_page(page)
+    pdf.Root.AcroForm = None
+    return pdf
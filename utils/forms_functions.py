@@ -1,4 +1,7 @@
+from bisect import bisect_left
+import numpy as np
 from utils.forms_constants import logger, override_keyword
+from utils.forms_tax_tables import TaxTable
 
 
 def get_main_info(d):
@@ -46,103 +49,107 @@ def get_main_info(d):
     return info
 
 
-def computation_2018(amount):
-    if amount == 0:
-        return 0
-    if amount <= 157500:
-        return amount * 0.24 - 5710.50
-    if amount <= 200000:
-        return amount * 0.32 - 18310.50
-    if amount <= 500000:
-        return amount * 0.35 - 24310.50
-    return amount * 0.37 - 34310.50
-
-
-def computation_2019(amount):
-    if amount == 0:
-        return 0
-    if amount <= 160725:
-        return amount * 0.24 - 5825.50
-    if amount <= 204100:
-        return amount * 0.32 - 18683.50
-    if amount <= 510300:
-        return amount * 0.35 - 24806.50
-    return amount * 0.37 - 35012.50
-
-
-def computation_2020(amount):
-    if amount == 0:
-        return 0
-    if amount <= 163300:
-        return amount * 0.24 - 5920.50
-    if amount <= 207350:
-        return amount * 0.32 - 18984.50
-    if amount <= 518400:
-        return amount * 0.35 - 25205
-    return amount * 0.37 - 35573
-
-
-def computation_2021(amount):
-    if amount == 0:
-        return 0
-    if amount <= 164925:
-        return amount * 0.24 - 5979.00
-    if amount <= 209425:
-        return amount * 0.32 - 19173.00
-    if amount <= 523600:
-        return amount * 0.35 - 25455.75
-    return amount * 0.37 - 35927.75
-
-
-def computation_2022(amount):
-    if amount == 0:
-        return 0
-    if amount <= 170050:
-        return amount * 0.24 - 6164.50
-    if amount <= 215950:
-        return amount * 0.32 - 19768.50
-    if amount <= 539900:
-        return amount * 0.35 - 26247.00
-    return amount * 0.37 - 37045.00
-
-
-def computation_2023(amount):
-    if amount == 0:
-        return 0  # not actually zero, but use the tables
-    if amount <= 182_100:
-        return amount * 0.24 - 6600.00
-    if amount <= 231_250:
-        return amount * 0.32 - 21168.00
-    if amount <= 578_125:
-        return amount * 0.35 - 28105.50
-    return amount * 0.37 - 39668.00
-
-
-def computation_2023_ny(amount):
-    if amount <= 17_150:
-        return amount * 0.04
-    if amount <= 23_600:
-        return 686 + (amount - 17_150) * 0.045
-    if amount <= 27_900:
-        return 976 + (amount - 23_600) * 0.0525
-    if amount <= 161_550:
-        return 1_202 + (amount - 27_900) * 0.0550
-    if amount <= 323_200:
-        return 8_553 + (amount - 161_550) * 0.06
-    if amount <= 2_155_350:
-        return 18_252 + (amount - 323_200) * 0.0685
-    if amount <= 5_000_000:
-        return 143_754 + (amount - 2_155_350) * 0.0965
-    if amount <= 25_000_000:
-        return 418_263 + (amount - 5_000_000) * 0.1030
-    return 2_478_263 + (amount - 25_000_000) * 0.1090
-
-
-def computation_2023_nyc(amount):
-    if amount <= 21_600:
-        return amount * 0.03078
-    if amount <= 45_000:
-        return 665 + (amount - 21_600) * 0.03762
-    if amount <= 90_000:
-        return 1_545 + (amount - 45_000) * 0.03819
-    return 3_264 + (amount - 90_000) * 0.03876
+class TaxBrackets:
+    # piecewise linear tax schedule, within a bracket: tax = base + (amount - lower) * rate
+    # brackets is a list of (upper, base, lower, rate), the bracket used is the first one with amount <= upper
+    # the last bracket has no upper bound (None)
+    # zero_at_zero is for the federal computation worksheets, only valid above the tax tables
+    # tax_table is used instead of the brackets below its limit (100k)
+    def __init__(self, brackets, zero_at_zero=False, tax_table=None):
+        self.upper = [b[0] for b in brackets[:-1]]
+        self.base = [b[1] for b in brackets]
+        self.lower = [b[2] for b in brackets]
+        self.rate = [b[3] for b in brackets]
+        self.zero_at_zero = zero_at_zero
+        self.tax_table = tax_table
+        self.upper_array = np.array(self.upper, dtype=float)
+        self.base_array = np.array(self.base, dtype=float)
+        self.lower_array = np.array(self.lower, dtype=float)
+        self.rate_array = np.array(self.rate, dtype=float)
+
+    def __call__(self, amount):
+        if type(amount) not in (int, float) and isinstance(amount, (np.ndarray, list, tuple)):
+            return self.vectorized(amount)
+        if self.tax_table is not None and amount < self.tax_table.limit:
+            return self.tax_table(amount)
+        if amount == 0 and self.zero_at_zero:
+            return 0
+        i = bisect_left(self.upper, amount)
+        return self.base[i] + (amount - self.lower[i]) * self.rate[i]
+
+    def vectorized(self, amount):
+        amount = np.asarray(amount, dtype=float)
+        i = np.searchsorted(self.upper_array, amount, side='left')
+        tax = self.base_array[i] + (amount - self.lower_array[i]) * self.rate_array[i]
+        if self.zero_at_zero:
+            tax = np.where(amount == 0, 0., tax)
+        if self.tax_table is not None:
+            tax = np.where(amount < self.tax_table.limit, self.tax_table.vectorized(amount), tax)
+        return tax
+
+
+# Tax Computation Worksheet - Section A (single), written as amount * rate - subtraction
+tax_brackets = {
+    "2018": TaxBrackets([
+        (157_500, -5_710.50, 0, 0.24),
+        (200_000, -18_310.50, 0, 0.32),
+        (500_000, -24_310.50, 0, 0.35),
+        (None, -34_310.50, 0, 0.37),
+    ], zero_at_zero=True),
+    "2019": TaxBrackets([
+        (160_725, -5_825.50, 0, 0.24),
+        (204_100, -18_683.50, 0, 0.32),
+        (510_300, -24_806.50, 0, 0.35),
+        (None, -35_012.50, 0, 0.37),
+    ], zero_at_zero=True),
+    "2020": TaxBrackets([
+        (163_300, -5_920.50, 0, 0.24),
+        (207_350, -18_984.50, 0, 0.32),
+        (518_400, -25_205, 0, 0.35),
+        (None, -35_573, 0, 0.37),
+    ], zero_at_zero=True),
+    "2021": TaxBrackets([
+        (164_925, -5_979.00, 0, 0.24),
+        (209_425, -19_173.00, 0, 0.32),
+        (523_600, -25_455.75, 0, 0.35),
+        (None, -35_927.75, 0, 0.37),
+    ], zero_at_zero=True),
+    "2022": TaxBrackets([
+        (170_050, -6_164.50, 0, 0.24),
+        (215_950, -19_768.50, 0, 0.32),
+        (539_900, -26_247.00, 0, 0.35),
+        (None, -37_045.00, 0, 0.37),
+    ], zero_at_zero=True),
+    "2023": TaxBrackets([
+        (182_100, -6_600.00, 0, 0.24),
+        (231_250, -21_168.00, 0, 0.32),
+        (578_125, -28_105.50, 0, 0.35),
+        (None, -39_668.00, 0, 0.37),
+    ], tax_table=TaxTable("2023")),
+    "2023_ny": TaxBrackets([
+        (17_150, 0, 0, 0.04),
+        (23_600, 686, 17_150, 0.045),
+        (27_900, 976, 23_600, 0.0525),
+        (161_550, 1_202, 27_900, 0.0550),
+        (323_200, 8_553, 161_550, 0.06),
+        (2_155_350, 18_252, 323_200, 0.0685),
+        (5_000_000, 143_754, 2_155_350, 0.0965),
+        (25_000_000, 418_263, 5_000_000, 0.1030),
+        (None, 2_478_263, 25_000_000, 0.1090),
+    ]),
+    "2023_nyc": TaxBrackets([
+        (21_600, 0, 0, 0.03078),
+        (45_000, 665, 21_600, 0.03762),
+        (90_000, 1_545, 45_000, 0.03819),
+        (None, 3_264, 90_000, 0.03876),
+    ]),
+}
+
+computation_2018 = tax_brackets["2018"]
+computation_2019 = tax_brackets["2019"]
+computation_2020 = tax_brackets["2020"]
+computation_2021 = tax_brackets["2021"]
+computation_2022 = tax_brackets["2022"]
+computation_2023 = tax_brackets["2023"]
+computation_2023_ny = tax_brackets["2023_ny"]
+computation_2023_nyc = tax_brackets["2023_nyc"]
@@ -0,0 +1,88 @@
+# declarative graph of form lines
+# inputs are set from the data, lines are declared with the lines they depend on and a function to compute them
+# changing an input only recomputes the lines downstream of it,
+# and propagation stops at lines whose value did not change (most lines are rounded to the dollar)
+from collections import defaultdict
+from heapq import heappush, heappop
+
+
+def is_int(value):
+    return type(value) is int
+
+
+class LineGraph:
+    def __init__(self):
+        self.values = {}
+        self.functions = {}  # key -> (function, dependencies), inputs have no function
+        self.sums = set()  # lines updated with the difference of their changed dependencies
+        self.dependents = defaultdict(list)
+        self.rank = {}  # topological order, inputs are 0
+        self.changed = {}  # input -> previous value, waiting to be propagated
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def input(self, key, value):
+        self.values[key] = value
+        self.rank[key] = 0
+
+    def line(self, key, dependencies, function):
+        dependencies = tuple(dependencies)
+        self.functions[key] = (function, dependencies)
+        self.rank[key] = 1 + max((self.rank[k] for k in dependencies), default=0)
+        for k in dependencies:
+            self.dependents[k].append(key)
+        self.values[key] = function(*(self.values[k] for k in dependencies))
+
+    def sum(self, key, dependencies):
+        # sum of many lines (trades), one changed dependency costs O(1) instead of O(dependencies)
+        # only when values are whole dollars (int), float sums are recomputed to stay exact
+        self.line(key, dependencies, lambda *values: sum(values))
+        self.sums.add(key)
+
+    def set(self, key, value):
+        if key in self.functions:
+            raise ValueError(f"Only inputs can be set, {key} is computed")
+        if value != self.values[key]:
+            self.changed.setdefault(key, self.values[key])
+            self.values[key] = value
+
+    def get(self, key):
+        if self.changed:
+            self.recompute()
+        return self.values[key]
+
+    def recompute(self):
+        # returns the number of lines recomputed
+        previous = self.changed
+        self.changed = {}
+        pending = defaultdict(list)  # line -> its dependencies that changed
+        heap = []
+        order = 0
+
+        def push_dependents(k):
+            nonlocal order
+            for dependent in self.dependents[k]:
+                if dependent not in pending:
+                    heappush(heap, (self.rank[dependent], order, dependent))
+                    order += 1
+                pending[dependent].append(k)
+
+        for k in list(previous):
+            push_dependents(k)
+
+        count = 0
+        while heap:
+            _, _, key = heappop(heap)
+            function, dependencies = self.functions[key]
+            if key in self.sums and is_int(self.values[key]) \
+                    and all(is_int(self.values[k]) and is_int(previous[k]) for k in pending[key]):
+                value = self.values[key] + sum(self.values[k] - previous[k] for k in pending[key])
+            else:
+                value = function(*(self.values[k] for k in dependencies))
+            count += 1
+            if value != self.values[key]:
+                previous[key] = self.values[key]
+                self.values[key] = value
+                push_dependents(key)
+        return count
@@ -0,0 +1,210 @@
+# line dependencies of the 2023 return, mirrors the computations of fill_taxes_2023
+# the worksheets (qualified dividends, capital loss carryover, school tax) are the ones of forms_core_2023
+# used for what-if sessions: build once, set inputs, get lines - only the affected lines are recomputed
+# inputs are keyed by their place in the data: ('W2', 0, 'Wages'), ('1099', 0, 'Trades', 3, 'Proceeds'), ...
+# lines are keyed by form and line: (k_1040, '15'), (k_1040sd, '16'), ...
+# the structure (number of W2 / 1099 / trades, which forms are filled) is fixed when the graph is built
+# ('delta', name) inputs start at 0 and shift one kind of income, for sensitivities and scenarios
+from utils.forms_functions import (
+    computation_2023 as computation,
+    computation_2023_ny as computation_ny,
+    computation_2023_nyc as computation_nyc,
+)
+from utils.forms_core_2023 import (
+    standard_deduction,
+    qualified_business_deduction,
+    health_savings_account_max_contribution,
+    qualified_dividends_worksheet,
+    schedule_d_capital_gain,
+    capital_loss_carryover_worksheet,
+    fixed_school_tax,
+    school_tax_reduction,
+)
+from utils.forms_graph import LineGraph
+from utils.form_worksheet_names import *
+
+capital_loss_limit = 3000  # single
+boxes = dict(
+    SHORT=dict(A='1a', B='2', C='3'),
+    LONG=dict(D='8a', E='9', F='10'),
+)
+
+w2_inputs = ['Wages', 'Federal_tax', 'Medicare_wages', 'Medicare_tax', 'State_tax', 'Local_tax']
+income_1099_inputs = ['Interest', 'Other Income', 'Ordinary Dividends', 'Qualified Dividends',
+                      'Capital Gain Distributions', 'Foreign Tax']
+trade_inputs = ['Proceeds', 'Cost', 'WashSaleValue']
+delta_inputs = ['wages', 'qualified_dividends', 'short_term_gain', 'long_term_gain']
+
+
+def build_graph_2023(d, output_2022=None):
+    g = LineGraph()
+    states_2022 = output_2022[0] if output_2022 is not None else None
+
+    # inputs
+    for i, w in enumerate(d['W2']):
+        for k in w2_inputs:
+            g.input(('W2', i, k), w[k])
+    for k in w2_inputs:
+        g.sum(('W2', k), [('W2', i, k) for i in range(len(d['W2']))])
+
+    has_1099 = '1099' in d
+    forms_1099 = d['1099'] if has_1099 else []
+    for i, f in enumerate(forms_1099):
+        for k in income_1099_inputs:
+            g.input(('1099', i, k), f.get(k, 0))
+            # schedule B rounds each payer
+            g.line(('1099', i, k, 'rounded'), [('1099', i, k)], round)
+    for k in income_1099_inputs:
+        g.sum(('1099', k), [('1099', i, k) for i in range(len(forms_1099))])
+        g.sum(('1099', k, 'rounded'), [('1099', i, k, 'rounded') for i in range(len(forms_1099))])
+
+    for k in delta_inputs:
+        g.input(('delta', k), 0)
+    # wages are also medicare wages, qualified dividends are also ordinary dividends
+    g.line(('W2', 'Wages', 'delta'), [('W2', 'Wages'), ('delta', 'wages')], lambda a, b: a + b)
+    g.line(('W2', 'Medicare_wages', 'delta'), [('W2', 'Medicare_wages'), ('delta', 'wages')], lambda a, b: a + b)
+    g.line(('1099', 'Qualified Dividends', 'delta'),
+           [('1099', 'Qualified Dividends'), ('delta', 'qualified_dividends')], lambda a, b: a + b)
+
+    # Form 1040 - income
+    g.line((k_1040, '1_a'), [('W2', 'Wages', 'delta')], round)
+    g.line((k_1040, '1_z'), [(k_1040, '1_a')], lambda x: x)
+    g.line((k_1040, '2_b'), [('1099', 'Interest', 'rounded'), ('1099', 'Other Income', 'rounded')],
+           lambda interest, other: round(interest + other))
+    g.line((k_1040, '3_b'), [('1099', 'Ordinary Dividends', 'rounded'), ('delta', 'qualified_dividends')],
+           lambda a, b: round(a + round(b)))
+    g.line((k_1040, '3_a'), [('1099', 'Qualified Dividends', 'delta')], round)
+
+    # Form 6781 and Form 8949 - gains by box
+    box_gains = {(ls, code): [] for ls, codes in boxes.items() for code in codes}
+    contracts = [(i, j) for i, f in enumerate(forms_1099) for j, _ in enumerate(f.get('Contract1256', []))]
+    if len(contracts) > 3:
+        raise ValueError("Form6781 more than 3 contracts need a new page")
+    if any(f.get('Contract1256', False) for f in forms_1099):
+        for i, j in contracts:
+            g.input(('1099', i, 'Contract1256', j, 'ProfitOrLoss'), forms_1099[i]['Contract1256'][j]['ProfitOrLoss'])
+        g.line((k_6781, '3'), [('1099', i, 'Contract1256', j, 'ProfitOrLoss') for i, j in contracts],
+               lambda *p: round(sum(round(x) for x in p if x > 0) - sum(round(-x) for x in p if x < 0)))
+        g.line((k_6781, '8'), [(k_6781, '3')], lambda x: round(x * 0.4))
+        g.line((k_6781, '9'), [(k_6781, '3')], lambda x: round(x * 0.6))
+        box_gains['SHORT', 'B'].append((k_6781, '8'))
+        box_gains['LONG', 'E'].append((k_6781, '9'))
+
+    for i, f in enumerate(forms_1099):
+        for j, t in enumerate(f.get('Trades', [])):
+            for k in trade_inputs:
+                g.input(('1099', i, 'Trades', j, k), t.get(k, 0))
+            g.line((k_8949, i, j, 'gain'), [('1099', i, 'Trades', j, k) for k in trade_inputs],
+                   lambda proceeds, cost, adjustment: round(proceeds) - round(cost) + round(adjustment))
+            for ls, code in box_gains:
+                if ls in t['LongShort'] and code == t['FormCode']:
+                    box_gains[ls, code].append((k_8949, i, j, 'gain'))
+
+    # Schedule D
+    if has_1099:
+        carryover = capital_loss_carryover_worksheet(states_2022)
+        line_6, line_14 = carryover[8], carryover[13]
+        g.input((w_capital_loss_carryover, 8), line_6)
+        g.input((w_capital_loss_carryover, 13), line_14)
+        g.line(('delta', 'short_term_gain', 'rounded'), [('delta', 'short_term_gain')], round)
+        g.line(('delta', 'long_term_gain', 'rounded'), [('delta', 'long_term_gain')], round)
+        box_gains['SHORT', 'A'].append(('delta', 'short_term_gain', 'rounded'))
+        box_gains['LONG', 'D'].append(('delta', 'long_term_gain', 'rounded'))
+        for (ls, code), gains in box_gains.items():
+            g.sum((k_1040sd, boxes[ls][code] + '_gain'), gains)
+        g.line((k_1040sd, '6'), [(w_capital_loss_carryover, 8)], round)
+        g.line((k_1040sd, '14'), [(w_capital_loss_carryover, 13)], round)
+        g.line((k_1040sd, '13'), [('1099', 'Capital Gain Distributions')], round)
+        g.line((k_1040sd, '7'), [(k_1040sd, '1a_gain'), (k_1040sd, '2_gain'), (k_1040sd, '3_gain'),
+                                 (k_1040sd, '6')],
+               lambda a, b, c, carryover: a + b + c - carryover)
+        g.line((k_1040sd, '15'), [(k_1040sd, '8a_gain'), (k_1040sd, '9_gain'), (k_1040sd, '10_gain'),
+                                  (k_1040sd, '13'), (k_1040sd, '14')],
+               lambda a, b, c, distributions, carryover: a + b + c + distributions - carryover)
+        g.line((k_1040sd, '16'), [(k_1040sd, '7'), (k_1040sd, '15')], lambda a, b: a + b)
+        g.line((k_1040, '7_value'), [(k_1040sd, '16')],
+               lambda x: x if x > 0 else -min(capital_loss_limit, -x) if x < 0 else 0)
+    else:
+        g.input((k_1040, '7_value'), 0)
+
+    # Form 8889 and Schedule 1 - HSA
+    if d.get('health_savings_account', False):
+        g.input(('health_savings_account_contributions',), d.get('health_savings_account_contributions', 0))
+        g.input(('health_savings_account_employer_contributions',),
+                d.get('health_savings_account_employer_contributions', 0))
+        g.input(('health_savings_account_distributions',), d.get('health_savings_account_distributions', 0))
+        g.line((k_8889, '13'), [('health_savings_account_contributions',),
+                                ('health_savings_account_employer_contributions',)],
+               lambda contributions, employer: round(min(
+                   round(contributions),
+                   round(max(0, health_savings_account_max_contribution - round(employer))))))
+        g.line((k_8889, '16'), [('health_savings_account_distributions',)], lambda x: round(x) - round(x))
+        g.line((k_1040, '8'), [(k_8889, '16')], lambda x: max(0, x))
+        g.line((k_1040, '10'), [(k_8889, '13')], lambda x: max(0, x))
+    else:
+        g.input((k_1040, '8'), 0)
+        g.input((k_1040, '10'), 0)
+
+    # Form 1040 - tax
+    g.line((k_1040, '9'), [(k_1040, k) for k in ['1_z', '2_b', '3_b', '7_value', '8']], lambda *x: sum(x))
+    g.line((k_1040, '11'), [(k_1040, '9'), (k_1040, '10')], lambda a, b: round(a - b))
+    g.input((k_1040, '12'), standard_deduction)
+    g.input((k_1040, '13'), qualified_business_deduction)
+    g.line((k_1040, '14'), [(k_1040, '12'), (k_1040, '13')], lambda a, b: a + b)
+    g.line((k_1040, '15'), [(k_1040, '11'), (k_1040, '14')], lambda a, b: round(max(0, a - b)))
+
+    if has_1099:
+        g.line((w_qualified_dividends_and_capital_gains,),
+               [(k_1040, '15'), (k_1040, '3_a'), (k_1040sd, '15'), (k_1040sd, '16'),
+                ('1099', 'Qualified Dividends', 'delta')],
+               lambda l15, l3a, sd15, sd16, q:
+               qualified_dividends_worksheet(l15, l3a, schedule_d_capital_gain(sd15, sd16)) if q else None)
+        g.line((k_1040, '16'), [(w_qualified_dividends_and_capital_gains,), (k_1040, '15')],
+               lambda w, l15: round(w[25]) if w is not None else round(computation(l15)))
+    else:
+        g.line((k_1040, '16'), [(k_1040, '15')], lambda l15: round(computation(l15)))
+
+    # Form 6251 - AMT
+    g.line((k_6251, '4_value'), [(k_1040, '15')], lambda x: x)
+    g.line((k_6251, '6_value'), [(k_6251, '4_value')], lambda x: round(max(0, x - 81_300)))
+    g.line((k_6251, '11_value'), [(k_6251, '6_value'), (k_1040, '16')],
+           lambda l6, l16: round(max(0, round(l6 * 0.26 if l6 < 220_700 else l6 * 0.28 - 4_414) - round(max(0, l16))))
+           if l6 > 0 else 0)
+
+    # Form 8959 - Additional Medicare Tax
+    g.line((k_8959, '1'), [('W2', 'Medicare_wages', 'delta')], round)
+    g.line((k_8959, '18'), [(k_8959, '1')], lambda x: round(max(0, round(200000 - x)) * 0.009))
+    g.line((k_8959, '21'), [(k_8959, '1')], lambda x: round(x * 0.0145))
+    g.line((k_8959, '24'), [('W2', 'Medicare_tax'), (k_8959, '21')], lambda a, b: round(max(0, round(a) - b)))
+
+    # Schedule 2, Schedule 3
+    g.line((k_1040, '17'), [(k_6251, '11_value')], lambda x: x)
+    g.line((k_1040, '23'), [(k_8959, '18')], lambda x: x)
+    g.line((k_1040, '20'), [('1099', 'Foreign Tax')], lambda x: round(x) if x > 0 else 0)
+
+    g.line((k_1040, '18'), [(k_1040, '16'), (k_1040, '17')], lambda a, b: a + b)
+    g.line((k_1040, '22'), [(k_1040, '18'), (k_1040, '20')], lambda a, b: round(max(0, a - b)))
+    g.line((k_1040, '24'), [(k_1040, '22'), (k_1040, '23')], lambda a, b: a + b)
+
+    # Form 1040 - payments
+    g.line((k_1040, '25_a'), [('W2', 'Federal_tax')], round)
+    g.line((k_1040, '25_d'), [(k_1040, '25_a'), (k_8959, '24')], lambda a, c: a + c)
+    g.line((k_1040, '33'), [(k_1040, '25_d')], lambda x: x)
+    g.line((k_1040, '34'), [(k_1040, '33'), (k_1040, '24')], lambda a, b: round(max(0, a - b)))
+    g.line((k_1040, '37'), [(k_1040, '33'), (k_1040, '24')], lambda a, b: round(max(0, b - a)))
+
+    # IT-201
+    g.line((k_it201, '17'), [(k_1040, k) for k in ['1_z', '2_b', '3_b', '7_value']], lambda *x: sum(x))
+    g.line((k_it201, '33'), [(k_it201, '17')], round)
+    g.input((k_it201, '34'), 8000)
+    g.line((k_it201, '38'), [(k_it201, '33'), (k_it201, '34')], lambda a, b: round(a - b))
+    g.line((k_it201, '46'), [(k_it201, '38')], lambda x: round(round(computation_ny(amount=x))))
+    g.line((k_it201, '58'), [(k_it201, '38')], lambda x: round(max(0, round(computation_nyc(amount=x)))))
+    g.line((k_it201, '62'), [(k_it201, '46'), (k_it201, '58')], lambda a, b: a + b)
+    g.line((k_it201, '69'), [(k_it201, '62')], fixed_school_tax)
+    g.line((k_it201, '69a'), [(k_it201, '62')], lambda x: round(school_tax_reduction(x)))
+    g.line((k_it201, '76'), [(k_it201, '69'), (k_it201, '69a'), ('W2', 'State_tax'), ('W2', 'Local_tax')],
+           lambda a, b, state, local: a + b + round(state) + round(local))
+    g.line((k_it201, '78'), [(k_it201, '76'), (k_it201, '62')], lambda a, b: round(max(0, a - b)))
+    g.line((k_it201, '80'), [(k_it201, '76'), (k_it201, '62')], lambda a, b: round(max(0, b - a)))
+    return g
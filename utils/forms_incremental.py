@@ -0,0 +1,127 @@
+# incremental update: the bytes of the blank form are copied as they are and the filled widgets are appended
+# after them, with a cross-reference section pointing to the new versions of the objects (/Prev to the old one)
+# the output costs the changed widgets only, the rest of the form is not parsed or written again
+# the widgets keep their object numbers, the other objects they point to are referenced, not copied
+import re
+import pdfrw
+from pdfrw.objects import PdfIndirect
+from pdfrw.pdfwriter import user_fmt
+
+xref_widths = 1, 4, 2  # type, offset, generation of each entry of a cross-reference stream
+
+
+def object_syntax(obj, top=False, numbers=None):
+    # obj written as in the file, the objects read from the form are references (12 0 R)
+    # numbers maps the id of the indirect objects to new object numbers, for a whole new file (forms_slim)
+    # streams are written by the caller, after their dictionary
+    indirect = getattr(obj, 'indirect', False)
+    if numbers is not None:
+        if not top and indirect and isinstance(obj, (pdfrw.PdfDict, pdfrw.PdfArray)):
+            return f"{numbers[id(obj)]} 0 R"
+        # indirect names and numbers are written in place
+    elif not top and isinstance(indirect, tuple):
+        return "%d %d R" % indirect
+    elif not top and indirect:
+        raise ValueError("New indirect objects are not written in an incremental update")
+    if isinstance(obj, pdfrw.PdfDict):
+        return "<<" + " ".join(f"{getattr(k, 'encoded', None) or k} {object_syntax(v, numbers=numbers)}"
+                               for k, v in obj.iteritems()) + ">>"
+    if isinstance(obj, pdfrw.PdfArray):
+        return "[" + " ".join(object_syntax(v, numbers=numbers) for v in obj) + "]"
+    if hasattr(obj, 'indirect'):  # names, strings and numbers read from the file
+        return str(getattr(obj, 'encoded', None) or obj)
+    return user_fmt(obj)
+
+
+def sections(numbers):
+    # consecutive object numbers grouped: [(first, count), ...]
+    runs = []
+    for n in sorted(numbers):
+        if runs and runs[-1][0] + runs[-1][1] == n:
+            runs[-1][1] += 1
+        else:
+            runs.append([n, 1])
+    return runs
+
+
+def write_incremental(file, out_file, template, objects):
+    # file is the blank form, template its PdfReader, objects the changed copies of its objects (same indirect key)
+    # the cross-reference is a stream when the form uses one, a table otherwise
+    with open(file, 'rb') as f:
+        data = f.read()
+    prev = int(re.findall(rb'startxref\s+(\d+)', data)[-1])
+    xref_stream = re.match(rb'\s*\d+\s+\d+\s+obj', data[prev:prev + 32]) is not None
+
+    body = bytearray(data if data.endswith(b'\n') else data + b'\n')
+    offsets = {}
+    for obj in objects:
+        number, generation = obj.indirect
+        offsets[number] = len(body), generation
+        body += f"{number} {generation} obj\n{object_syntax(obj, top=True)}\nendobj\n".encode('latin-1')
+
+    trailer = {'/Root': template.Root, '/Info': template.Info, '/ID': template.ID}
+    trailer = " ".join(f"{k} {object_syntax(v)}" for k, v in trailer.items() if v is not None)
+    size = int(template.Size)
+    start = len(body)
+    if xref_stream:
+        offsets[size] = start, 0  # the cross-reference stream is a new object
+        runs = sections(offsets)
+        rows = b"".join(
+            bytes([1]) + offsets[n][0].to_bytes(xref_widths[1], 'big') + offsets[n][1].to_bytes(xref_widths[2], 'big')
+            for first, count in runs for n in range(first, first + count))
+        index = " ".join(f"{first} {count}" for first, count in runs)
+        body += (f"{size} 0 obj\n<</Type /XRef /Size {size + 1} /W [{' '.join(map(str, xref_widths))}] "
+                 f"/Index [{index}] {trailer} /Prev {prev} /Length {len(rows)}>>\nstream\n").encode('latin-1')
+        body += rows + b"\nendstream\nendobj\n"
+    else:
+        body += b"xref\n"
+        for first, count in sections(offsets):
+            body += f"{first} {count}\n".encode('latin-1')
+            for n in range(first, first + count):
+                body += f"{offsets[n][0]:010d} {offsets[n][1]:05d} n\r\n".encode('latin-1')
+        body += f"trailer\n<</Size {size} {trailer} /Prev {prev}>>\n".encode('latin-1')
+    body += f"startxref\n{start}\n%%EOF\n".encode('latin-1')
+
+    with open(out_file, 'wb') as f:
+        f.write(body)
+
+
+class UpdatedPdfReader(pdfrw.PdfReader):
+    # PdfReader reading the objects of the incremental updates over the first revision
+    # pdfrw loads the object streams of the first revision after the later cross-references, the widgets of the IRS
+    # forms are in object streams: a filled widget written by write_incremental would be read blank
+    # the objects given an offset by a later revision are left out of the object streams and read at that offset
+    def updated_objects(self):
+        return vars(self).setdefault('updated_keys', set())  # private attribute, not in the pdf dictionary
+
+    def parsexref(self, source):
+        trailer, is_stream = pdfrw.PdfReader.parsexref(self, source)
+        if trailer.Prev is not None:  # not the first revision
+            self.updated_objects().update(source.obj_offsets)
+        return trailer, is_stream
+
+    def placeholder(self, key):
+        result = self.indirect_objects[key] = PdfIndirect(key)
+        result._loader = self.loadindirect
+        self.deferred_objects.add(key)
+        return result
+
+    def findindirect(self, objnum, gennum):
+        result = pdfrw.PdfReader.findindirect(self, objnum, gennum)
+        key = int(objnum), int(gennum)
+        if self.loading_streams and key in self.updated_objects() and not isinstance(result, PdfIndirect):
+            result = self.placeholder(key)  # the old version was just read from a stream
+        return result
+
+    def load_stream_objects(self, object_streams):
+        updated = self.updated_objects()
+        loaded = {key: self.indirect_objects.get(key) for key in updated}
+        self.private.loading_streams = True
+        try:
+            pdfrw.PdfReader.load_stream_objects(self, object_streams)
+        finally:
+            self.private.loading_streams = False
+        for key in updated:
+            result = self.indirect_objects.get(key)
+            if result is not loaded[key] and not isinstance(result, PdfIndirect):
+                self.placeholder(key)
@@ -0,0 +1,123 @@
+# what-if grid for the 2023 return, evaluated for all the points at once with array math
+# the parts of the return that do not move with the deltas are read once from the line graph,
+# then Form 1040 lines 7 - 24, the qualified dividends worksheet, Form 6251 and IT-201 are computed on arrays
+# deltas are the same as the graph ones: wages, qualified_dividends, short_term_gain, long_term_gain
+# plus health_savings_account_contributions, only when the HSA limit (health_savings_account_max_contribution) is set:
+# with a limit of 0 the deduction is always 0 and that axis is refused rather than giving flat results
+# the worksheets are the ones of forms_core_2023, they take arrays
+from itertools import product
+import numpy as np
+from utils.forms_functions import (
+    computation_2023 as computation,
+    computation_2023_ny as computation_ny,
+    computation_2023_nyc as computation_nyc,
+)
+from utils.forms_core_2023 import (
+    health_savings_account_max_contribution,
+    qualified_dividends_worksheet,
+    schedule_d_capital_gain,
+    fixed_school_tax,
+    school_tax_reduction,
+)
+from utils.forms_graph_2023 import build_graph_2023, delta_inputs, capital_loss_limit
+from utils.form_worksheet_names import *
+
+scenario_inputs = delta_inputs + ['health_savings_account_contributions']
+
+
+def scenario_grid(**axes):
+    # cartesian product of the axes, e.g. scenario_grid(wages=[0, 10000], long_term_gain=np.arange(0, 1e5, 1e3))
+    names = list(axes)
+    points = np.array(list(product(*(np.asarray(axes[k], dtype=float) for k in names))), dtype=float)
+    return {k: points[:, i] for i, k in enumerate(names)}
+
+
+def scenarios_2023(d, deltas, output_2022=None, graph=None):
+    # deltas maps names of scenario_inputs to arrays (all the same length), missing ones are 0
+    # returns a dictionary of arrays keyed like the graph lines: (k_1040, '24'), (k_it201, '46'), ...
+    unknown = set(deltas) - set(scenario_inputs)
+    if unknown:
+        raise ValueError(f"Unknown scenario inputs {unknown}")
+    if 'health_savings_account_contributions' in deltas and health_savings_account_max_contribution <= 0:
+        raise ValueError("Scenario input health_savings_account_contributions has no effect "
+                         "with health_savings_account_max_contribution 0")
+    g = graph if graph is not None else build_graph_2023(d, output_2022)
+    n = len(next(iter(deltas.values()))) if deltas else 1
+    delta = {k: np.broadcast_to(np.asarray(deltas.get(k, 0.), dtype=float), (n,)) for k in scenario_inputs}
+    out = {}
+
+    # income
+    out[k_1040, '1_z'] = np.round(g.get(('W2', 'Wages')) + delta['wages'])
+    out[k_1040, '2_b'] = np.full(n, g.get((k_1040, '2_b')), dtype=float)
+    out[k_1040, '3_b'] = np.round(
+        g.get(('1099', 'Ordinary Dividends', 'rounded')) + np.round(delta['qualified_dividends']))
+    qualified_dividends = g.get(('1099', 'Qualified Dividends')) + delta['qualified_dividends']
+    out[k_1040, '3_a'] = np.round(qualified_dividends)
+
+    has_schedule_d = (k_1040sd, '16') in g
+    if has_schedule_d:
+        short_term = sum(g.get((k_1040sd, k)) for k in ['1a_gain', '2_gain', '3_gain'])
+        long_term = sum(g.get((k_1040sd, k)) for k in ['8a_gain', '9_gain', '10_gain'])
+        out[k_1040sd, '7'] = short_term - g.get(('delta', 'short_term_gain', 'rounded')) \
+            + np.round(g.get(('delta', 'short_term_gain')) + delta['short_term_gain']) - g.get((k_1040sd, '6'))
+        out[k_1040sd, '15'] = long_term - g.get(('delta', 'long_term_gain', 'rounded')) \
+            + np.round(g.get(('delta', 'long_term_gain')) + delta['long_term_gain']) \
+            + g.get((k_1040sd, '13')) - g.get((k_1040sd, '14'))
+        sd16 = out[k_1040sd, '16'] = out[k_1040sd, '7'] + out[k_1040sd, '15']
+        out[k_1040, '7_value'] = np.where(sd16 > 0, sd16, np.where(sd16 < 0, -np.minimum(capital_loss_limit, -sd16), 0))
+    else:
+        out[k_1040, '7_value'] = np.zeros(n)
+
+    out[k_1040, '8'] = np.full(n, g.get((k_1040, '8')), dtype=float)
+    if (k_8889, '13') in g or 'health_savings_account_contributions' in deltas:
+        contributions = d.get('health_savings_account_contributions', 0) \
+            + delta['health_savings_account_contributions']
+        employer = d.get('health_savings_account_employer_contributions', 0)
+        out[k_1040, '10'] = np.maximum(0, np.round(np.minimum(
+            np.round(contributions),
+            np.round(max(0, health_savings_account_max_contribution - round(employer))))))
+    else:
+        out[k_1040, '10'] = np.full(n, g.get((k_1040, '10')), dtype=float)
+
+    # tax
+    out[k_1040, '9'] = sum(out[k_1040, k] for k in ['1_z', '2_b', '3_b', '7_value', '8'])
+    out[k_1040, '11'] = np.round(out[k_1040, '9'] - out[k_1040, '10'])
+    out[k_1040, '14'] = np.full(n, g.get((k_1040, '14')), dtype=float)
+    l15 = out[k_1040, '15'] = np.round(np.maximum(0, out[k_1040, '11'] - out[k_1040, '14']))
+    if (w_qualified_dividends_and_capital_gains,) in g:
+        worksheet = qualified_dividends_worksheet(
+            l15, out[k_1040, '3_a'], schedule_d_capital_gain(out[k_1040sd, '15'], out[k_1040sd, '16']))
+        for i, v in enumerate(worksheet[1:], 1):
+            out[w_qualified_dividends_and_capital_gains, i] = np.broadcast_to(v, (n,))
+        out[k_1040, '16'] = np.round(np.where(qualified_dividends != 0, worksheet[25], computation(l15)))
+    else:
+        out[k_1040, '16'] = np.round(computation(l15))
+
+    # Form 6251
+    l6 = out[k_6251, '6_value'] = np.round(np.maximum(0, l15 - 81_300))
+    tentative = np.round(np.where(l6 < 220_700, l6 * 0.26, l6 * 0.28 - 4_414))
+    out[k_6251, '11_value'] = np.where(
+        l6 > 0, np.round(np.maximum(0, tentative - np.round(np.maximum(0, out[k_1040, '16'])))), 0)
+
+    # Form 8959, wages are also medicare wages
+    medicare_wages = np.round(g.get(('W2', 'Medicare_wages')) + delta['wages'])
+    out[k_8959, '18'] = np.round(np.maximum(0, np.round(200000 - medicare_wages)) * 0.009)
+
+    out[k_1040, '17'] = out[k_6251, '11_value']
+    out[k_1040, '18'] = out[k_1040, '16'] + out[k_1040, '17']
+    out[k_1040, '20'] = np.full(n, g.get((k_1040, '20')), dtype=float)
+    out[k_1040, '22'] = np.round(np.maximum(0, out[k_1040, '18'] - out[k_1040, '20']))
+    out[k_1040, '23'] = out[k_8959, '18']
+    out[k_1040, '24'] = out[k_1040, '22'] + out[k_1040, '23']
+
+    # IT-201
+    out[k_it201, '33'] = np.round(sum(out[k_1040, k] for k in ['1_z', '2_b', '3_b', '7_value']))
+    l38 = out[k_it201, '38'] = np.round(out[k_it201, '33'] - g.get((k_it201, '34')))
+    out[k_it201, '46'] = np.round(computation_ny(l38))
+    out[k_it201, '58'] = np.maximum(0, np.round(computation_nyc(l38)))
+    l62 = out[k_it201, '62'] = out[k_it201, '46'] + out[k_it201, '58']
+    out[k_it201, '76'] = fixed_school_tax(l62) + np.round(school_tax_reduction(l62)) \
+        + round(g.get(('W2', 'State_tax'))) + round(g.get(('W2', 'Local_tax')))
+    out[k_it201, '78'] = np.round(np.maximum(0, out[k_it201, '76'] - l62))
+    out[k_it201, '80'] = np.round(np.maximum(0, l62 - out[k_it201, '76']))
+    return out
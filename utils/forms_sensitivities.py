@@ -0,0 +1,56 @@
+# marginal and effective tax rates for the 2023 return
+# the line graph is built once (warm), then each kind of income is bumped by step and put back:
+# every bump only recomputes the lines downstream of that income, not the whole return
+from utils.forms_graph_2023 import build_graph_2023, delta_inputs
+from utils.form_worksheet_names import *
+
+tax_lines = {
+    'federal': (k_1040, '24'),  # total tax
+    'ny': (k_it201, '46'),  # total New York State taxes
+    'nyc': (k_it201, '58'),  # total New York City taxes
+}
+income_line = (k_1040, '9')  # total income
+
+
+def taxes(g):
+    t = {k: g.get(line) for k, line in tax_lines.items()}
+    t['total'] = sum(t.values())
+    return t
+
+
+def effective_rates(summary_info):
+    # from the summary_info output of fill_taxes_2023, without any recomputation
+    income = summary_info[f"{k_1040} 9 Total income"]
+    t = {
+        'federal': summary_info.get(f"{k_1040} 24 Total Tax", 0),
+        'ny': summary_info.get(f"{k_it201} 46 Total New York State taxes", 0),
+        'nyc': summary_info.get(f"{k_it201} 58 Total New York City and Yonkers taxes / surcharges and MCTMT", 0),
+    }
+    t['total'] = sum(t.values())
+    return {k: v / income if income else 0. for k, v in t.items()}
+
+
+def sensitivities_2023(d, output_2022=None, step=1000., graph=None):
+    # step is large enough for the dollar rounding of the lines not to matter much (1$ / step)
+    # pass graph to reuse a warm graph from a what-if session, it is left as it was found
+    g = graph if graph is not None else build_graph_2023(d, output_2022)
+    base = taxes(g)
+    income = g.get(income_line)
+
+    marginal = {}
+    for k in delta_inputs:
+        if ('delta', k) not in g:
+            continue
+        previous = g.get(('delta', k))
+        g.set(('delta', k), previous + step)
+        bumped = taxes(g)
+        g.set(('delta', k), previous)
+        marginal[k] = {kk: (bumped[kk] - base[kk]) / step for kk in base}
+    g.recompute()
+
+    return {
+        'effective': {k: v / income if income else 0. for k, v in base.items()},
+        'marginal': marginal,
+        'taxes': base,
+        'total_income': income,
+    }
@@ -0,0 +1,153 @@
+# slimmed copies of the blank forms (slim_forms.py), used by the fill path instead of forms/ when they are there
+# removed: XFA (the AcroForm fields are what gets filled), XMP metadata, Adobe XFA version check scripts,
+# page resources not used by the page content, objects not reachable anymore, and the structure tree (tags) unless kept
+# written with object streams and a cross-reference stream, every stream flate compressed
+# the fonts of the IRS forms are already subsets (ABCDEF+ prefix), they are kept as they are
+# the pages, their widgets and the field names are unchanged, .keys and template indexes work the same
+import os
+import re
+import zlib
+import pdfrw
+from utils.forms_constants import logger, forms_folder, forms_slim_folder
+from utils.forms_incremental import object_syntax, xref_widths
+
+objects_per_stream = 200
+resource_categories = [pdfrw.PdfName(u) for u in
+                       ['Font', 'XObject', 'ExtGState', 'ColorSpace', 'Pattern', 'Shading', 'Properties']]
+content_name = re.compile(r'/([^\s/\[\]()<>{}%]+)')
+
+
+def slim_path(file):
+    # forms/2023/Federal/f1040.pdf -> forms_slim/2023/Federal/f1040.pdf
+    return os.path.join(forms_slim_folder, os.path.relpath(file, forms_folder))
+
+
+def template_path(file):
+    # the slimmed copy of the blank form when it is there and newer than the form
+    slim = slim_path(file)
+    if os.path.isfile(slim) and os.path.getmtime(slim) >= os.path.getmtime(file):
+        return slim
+    return file
+
+
+def prune_resources(page):
+    # entries of the page resources whose name does not appear in the content
+    contents = page.Contents
+    contents = [c for c in (contents if isinstance(contents, pdfrw.PdfArray) else [contents]) if c is not None]
+    if page.Resources is None or any(c.Filter is not None for c in contents):
+        return  # content not readable, kept as is
+    used = {'/' + u for c in contents for u in content_name.findall(c.stream or "")}
+    resources = pdfrw.PdfDict(page.Resources)  # may be shared with other pages
+    for category in resource_categories:
+        if isinstance(resources[category], pdfrw.PdfDict):
+            kept = pdfrw.PdfDict({k: v for k, v in resources[category].iteritems() if k in used})
+            resources[category] = kept or None
+    page.Resources = resources
+
+
+def slim_pdf(pdf, keep_structure=False):
+    # pdf is a PdfReader read with decompress=True, changed in place
+    root = pdf.Root
+    root.Metadata = None
+    root.PieceInfo = None
+    root.Perms = None  # usage rights, not valid for the modified file
+    root.Extensions = None  # Adobe extension level of the XFA
+    if root.AcroForm is not None:
+        root.AcroForm.XFA = None
+    if root.Names is not None and root.Names.JavaScript is not None and root.Names.JavaScript.Names is not None:
+        scripts = root.Names.JavaScript.Names
+        kept = pdfrw.PdfArray()
+        for name, script in zip(scripts[::2], scripts[1::2]):
+            if not name.decode().startswith("!ADBE::"):
+                kept.extend([name, script])
+        root.Names.JavaScript = pdfrw.PdfDict(Names=kept) if kept else None
+        if not any(True for _ in root.Names.iteritems()):
+            root.Names = None
+    if not keep_structure:
+        root.StructTreeRoot = None
+        root.MarkInfo = None
+    for page in pdf.pages:
+        page.Metadata = None
+        page.PieceInfo = None
+        if not keep_structure:
+            page.StructParents = None
+            for annotation in page.Annots or []:
+                annotation.StructParent = None
+        prune_resources(page)
+    return pdf
+
+
+def write_compact(out_file, trailer):
+    # reachable objects only, the ones that are not streams packed in object streams
+    numbers = {}
+    objects = []
+    stack = [trailer.Root] + ([trailer.Info] if trailer.Info is not None else [])
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, (pdfrw.PdfDict, pdfrw.PdfArray)):
+            if obj.indirect or getattr(obj, 'stream', None) is not None:
+                if id(obj) in numbers:
+                    continue
+                obj.indirect = True
+                numbers[id(obj)] = len(objects) + 1
+                objects.append(obj)
+            stack.extend(reversed([v for _, v in obj.iteritems()] if isinstance(obj, pdfrw.PdfDict) else list(obj)))
+
+    streams = [obj for obj in objects if isinstance(obj, pdfrw.PdfDict) and obj.stream is not None]
+    packed = [obj for obj in objects if not (isinstance(obj, pdfrw.PdfDict) and obj.stream is not None)]
+    entries = {}  # object number -> (type, offset or object stream number, index in the object stream)
+    body = bytearray(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+
+    def write_stream(number, dictionary, data):
+        entries[number] = 1, len(body), 0
+        body.extend(f"{number} 0 obj\n{dictionary}\nstream\n".encode('latin-1'))
+        body.extend(data + b"\nendstream\nendobj\n")
+
+    for obj in streams:
+        data = obj.stream.encode('latin-1')
+        if obj.Filter is None:
+            data = zlib.compress(data, 9)
+            obj.Filter = pdfrw.PdfName.FlateDecode
+        obj.Length = len(data)
+        write_stream(numbers[id(obj)], object_syntax(obj, top=True, numbers=numbers), data)
+
+    next_number = len(objects) + 1
+    for start in range(0, len(packed), objects_per_stream):
+        chunk = packed[start:start + objects_per_stream]
+        offsets = []
+        contents = bytearray()
+        for i, obj in enumerate(chunk):
+            offsets.append(f"{numbers[id(obj)]} {len(contents)}")
+            entries[numbers[id(obj)]] = 2, next_number, i
+            contents.extend(object_syntax(obj, top=True, numbers=numbers).encode('latin-1') + b"\n")
+        header = (" ".join(offsets) + "\n").encode('latin-1')
+        data = zlib.compress(header + contents, 9)
+        write_stream(next_number, f"<</Type /ObjStm /N {len(chunk)} /First {len(header)} /Filter /FlateDecode "
+                                  f"/Length {len(data)}>>", data)
+        next_number += 1
+
+    # cross-reference stream, object 0 is the head of the free list
+    xref_number = next_number
+    entries[0] = 0, 0, 65535
+    entries[xref_number] = 1, len(body), 0
+    rows = b"".join(
+        bytes([entries[n][0]]) + entries[n][1].to_bytes(xref_widths[1], 'big')
+        + entries[n][2].to_bytes(xref_widths[2], 'big') for n in range(xref_number + 1))
+    data = zlib.compress(rows, 9)
+    body.extend(f"{xref_number} 0 obj\n<</Type /XRef /Size {xref_number + 1} "
+                f"/W [{' '.join(map(str, xref_widths))}] /Root {numbers[id(trailer.Root)]} 0 R"
+                f"{' /Info ' + object_syntax(trailer.Info, numbers=numbers) if trailer.Info is not None else ''}"
+                f"{' /ID ' + object_syntax(trailer.ID) if trailer.ID is not None else ''} "
+                f"/Filter /FlateDecode /Length {len(data)}>>\nstream\n".encode('latin-1'))
+    body.extend(data + f"\nendstream\nendobj\nstartxref\n{entries[xref_number][1]}\n%%EOF\n".encode('latin-1'))
+    with open(out_file + ".tmp", 'wb') as f:
+        f.write(body)
+    os.replace(out_file + ".tmp", out_file)
+
+
+def slim_form(file, keep_structure=False):
+    out_file = slim_path(file)
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    write_compact(out_file, slim_pdf(pdfrw.PdfReader(file, decompress=True), keep_structure))
+    logger.info("Slimmed %s to %s, %i -> %i bytes", file, out_file, os.path.getsize(file), os.path.getsize(out_file))
+    return out_file
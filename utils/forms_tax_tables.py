@@ -0,0 +1,122 @@
+# IRS Tax Table (taxable income lower than 100k)
+# rows are parsed once from the instructions pdf (i1040tt.pdf) and saved next to it as a compact numpy archive
+# lookup is O(1): $50 rows are indexed by arithmetic, the irregular rows below 3000 by a $5 resolution map
+import os
+import re
+from collections import defaultdict
+import numpy as np
+from utils.forms_constants import logger, forms_folder, pdf_extension, tax_table_extension
+
+tax_table_name = "i1040tt"
+tax_table_pages = {
+    "2023": range(2, 14),
+}
+tax_table_columns = ['single', 'married_filing_jointly', 'married_filing_separately', 'head_of_household']
+tax_table_limit = 100_000
+tax_table_step = 50
+tax_table_low_step = 5
+
+root_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def tax_table_file(year_folder, extension):
+    return os.path.join(root_folder, forms_folder, year_folder, "Federal", tax_table_name + extension)
+
+
+def extract_tax_table(file, pages):
+    # each row of the table is: at least, but less than, single, married jointly, married separately, head of household
+    # the pdf has three tables side by side, so one printed line holds 6, 12 or 18 numbers
+    from pdfminer.high_level import extract_pages  # slow import, only needed to rebuild the table
+    from pdfminer.layout import LTTextLine
+
+    number = re.compile(r'^[\d,]+$')
+    rows = []
+    for page in extract_pages(file, page_numbers=pages):
+        lines = defaultdict(list)
+
+        def walk(o):
+            if isinstance(o, LTTextLine):
+                # last row of a block sometimes merges 'at least' and 'less than' in one text line
+                for i, s in enumerate(o.get_text().split()):
+                    if number.match(s):
+                        lines[round(o.y0)].append((o.x0, i, int(s.replace(',', ''))))
+            elif hasattr(o, '__iter__'):
+                for c in o:
+                    walk(c)
+        walk(page)
+
+        for values in lines.values():
+            values = [v for _, _, v in sorted(values)]
+            if len(values) % 6 == 0:
+                rows.extend(tuple(values[i:i + 6]) for i in range(0, len(values), 6))
+    rows.sort()
+
+    previous = 0
+    for row in rows:
+        if row[0] != previous:
+            raise ValueError(f"Tax table {file} - missing rows between {previous} and {row[0]}")
+        previous = row[1]
+    if previous != tax_table_limit:
+        raise ValueError(f"Tax table {file} - ends at {previous}")
+    return np.array(rows, dtype=np.int32)
+
+
+def build_tax_table(year_folder):
+    pdf_file = tax_table_file(year_folder, pdf_extension)
+    logger.info("Parsing tax table %s", pdf_file)
+    rows = extract_tax_table(pdf_file, tax_table_pages[year_folder])
+    out_file = tax_table_file(year_folder, tax_table_extension)
+    np.savez_compressed(out_file, at_least=rows[:, 0], less_than=rows[:, 1], tax=rows[:, 2:])
+    logger.info("Tax table saved %s - %d rows", out_file, len(rows))
+
+
+class TaxTable:
+    def __init__(self, year_folder, column='single'):
+        self.year_folder = year_folder
+        self.column = tax_table_columns.index(column)
+        self.limit = tax_table_limit
+        self.loaded = False
+
+    def load(self):
+        file = tax_table_file(self.year_folder, tax_table_extension)
+        if not os.path.isfile(file):
+            build_tax_table(self.year_folder)
+        with np.load(file) as archive:
+            at_least = archive['at_least']
+            less_than = archive['less_than']
+            tax = archive['tax'][:, self.column]
+
+        # first row from which all rows are $50 wide
+        wide = (less_than - at_least) == tax_table_step
+        self.start = int(at_least[np.flatnonzero(~wide)[-1] + 1])
+        self.offset = int(np.searchsorted(at_least, self.start))
+        # row index for every $5 below start
+        low = np.arange(0, self.start, tax_table_low_step)
+        self.low_index = np.searchsorted(at_least, low, side='right') - 1
+
+        self.tax_array = tax.astype(float)
+        self.tax = tax.tolist()
+        self.low_index_list = self.low_index.tolist()
+        self.loaded = True
+
+    def __call__(self, amount):
+        if not self.loaded:
+            self.load()
+        if type(amount) not in (int, float) and isinstance(amount, (np.ndarray, list, tuple)):
+            return self.vectorized(amount)
+        amount = min(max(amount, 0), self.limit - 1)  # same rows as vectorized
+        if amount >= self.start:
+            return self.tax[self.offset + int(amount - self.start) // tax_table_step]
+        return self.tax[self.low_index_list[int(amount) // tax_table_low_step]]
+
+    def vectorized(self, amount):
+        if not self.loaded:
+            self.load()
+        amount = np.clip(np.asarray(amount, dtype=float), 0, self.limit - 1).astype(np.int64)
+        low = amount < self.start
+        row = np.where(
+            low,
+            self.low_index[np.where(low, amount, 0) // tax_table_low_step],
+            self.offset + (amount - self.start) // tax_table_step,
+        )
+        return self.tax_array[row]
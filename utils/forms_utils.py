@@ -1,8 +1,18 @@
 import os
 import glob
-import re
+import json
+import pickle
+import hashlib
+from collections import OrderedDict
 import pdfrw
 from utils.forms_constants import *
+from utils.forms_flatten import flatten_pdf
+from utils.forms_incremental import write_incremental
+
+
+def form_year(file):
+    # forms/2023/Federal/f1040.pdf -> 2023
+    return os.path.relpath(file, forms_folder).split(os.sep)[0]
 
 
 def map_folders(name, year_folder):
@@ -21,52 +31,425 @@ def map_folders(name, year_folder):
     logger.info("Folders created for %s - Done", name)
 
 
-def load_keys(file, out_dict=True):
-    if out_dict:
-        d = {}
-    else:
-        d = []
-    with open(file, 'r') as f:
-        logger.info("Loading keys from %s", file)
-        for l in f:
-            if l[0] == '#':  # ignore comments
-                continue
-            s = re.split(r'[ \t\n]+', l)
-            if out_dict:
-                d[s[1]] = s[0], s[2]  # some random stuff at the end
-            else:
-                d.append((s[0], s[1], s[2]))
-    return d
-
-
-def fill_pdf_from_keys(file, out_file, d):
-    # file is the pdf file
-    # d is the dictionary mapping the annotation fields to values
-    template_pdf = pdfrw.PdfReader(file)
+keys_format_version = "2"  # bump when the key map format changes
+
+
+def keys_version(file):
+    stat = os.stat(file)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def write_key_map(file, d):
+    # key map of a form (.keymap) written by fill_keys: annotation field -> (name, type), pickled
+    with open(file + ".tmp", 'wb') as f:
+        pickle.dump(dict(version=keys_format_version, keys=d), f, pickle.HIGHEST_PROTOCOL)
+    os.replace(file + ".tmp", file)
+
+
+def read_key_map(file):
+    # None when the key map is not readable or of another format
+    try:
+        with open(file, 'rb') as f:
+            saved = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if saved.get('version') == keys_format_version:
+        return saved['keys']
+    return None
+
+
+key_cache = {}  # path -> [version of the key map, dictionary, inverse], for all the returns of the process
+
+
+def keys_entry(file):
+    # file is the form or its key map, same name with the .keymap extension
+    path = os.path.splitext(os.path.abspath(file))[0] + keymap_extension
+    d = None
+    if os.path.isfile(path):
+        version = keys_version(path)
+        cached = key_cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached
+        d = read_key_map(path)
+    if d is None:
+        raise ValueError(f"Key map not readable {path}, run fill_keys again")
+    cached = key_cache[path] = [version, d, None]
+    return cached
+
+
+def load_keys(file):
+    # annotation field -> (name, type), from the process cache, else the .keymap
+    # the dictionary returned is a copy, callers can update it
+    return dict(keys_entry(file)[1])
+
 
-    for annotations in template_pdf.pages:
+def load_inverse_keys(file):
+    # name used by the engines ('1_z', 'I_1_3_proceeds') -> annotation fields with that name, built once per process
+    # shared by all the callers, not to be changed
+    entry = keys_entry(file)
+    if entry[2] is None:
+        inverse = {}
+        for k, (name, _) in entry[1].items():
+            inverse.setdefault(name, []).append(k)
+        entry[2] = inverse
+    return entry[2]
+
+
+def copy_pdf_object(obj, memo):
+    # copy of the dictionaries and arrays of the object graph, names/strings/stream contents are immutable and shared
+    # memo maps id of the copied objects to their copies, keeps the shared objects (and the cycles) as they are
+    if id(obj) in memo:
+        return memo[id(obj)]
+    if isinstance(obj, pdfrw.PdfDict):
+        new = pdfrw.PdfDict()
+        memo[id(obj)] = new
+        new.indirect = obj.indirect
+        for k, v in obj.iteritems():
+            dict.__setitem__(new, k, copy_pdf_object(v, memo))
+        if obj.stream is not None:
+            new._stream = obj.stream  # /Length is copied with the dictionary
+        return new
+    if isinstance(obj, pdfrw.PdfArray):
+        new = pdfrw.PdfArray()
+        memo[id(obj)] = new
+        new.indirect = obj.indirect
+        list.extend(new, [copy_pdf_object(v, memo) for v in obj])
+        return new
+    return obj
+
+
+template_index_version = "2"  # bump when the index format changes
+
+
+def full_name(field):
+    names = []
+    while field is not None:
+        if field[ANNOT_FIELD_KEY] is not None:
+            names.append(field[ANNOT_FIELD_KEY].decode())
+        field = field.Parent
+    return ".".join(reversed(names))
+
+
+def build_template_index(template):
+    # field name -> type and its widgets: page, position in /Annots, widget number, checked appearance state
+    # widget number is the order of the widget among all the widgets of the form, as numbered by key_matcher
+    # widgets sharing a name (radio buttons) have their own checked state
+    # names are the fully qualified names of the field (topmostSubform[0].Page1[0].f1_01[0]), for FDF and XFDF
+    index = {}
+    number = 0
+    for page, annotations in enumerate(template.pages):
         if ANNOT_KEY in annotations:
-            for annotation in annotations[ANNOT_KEY]:
+            for position, annotation in enumerate(annotations[ANNOT_KEY]):
                 if annotation[SUBTYPE_KEY] == WIDGET_SUBTYPE_KEY:
                     if annotation[ANNOT_FIELD_KEY]:
                         key = annotation[ANNOT_FIELD_KEY][1:-1]
-                        if key in d.keys():
-                            if annotation[ANNOT_FIELD_TYPE_KEY] == ANNOT_FIELD_TYPE_BTN:
-                                if d[key]:
-                                    annotation.update(pdfrw.PdfDict(AS=next(iter(annotation['/AP']['/N']))))
-                                else:
-                                    annotation.update(pdfrw.PdfDict(AS='Off'))
-                            elif annotation[ANNOT_FIELD_TYPE_KEY] == ANNOT_FIELD_TYPE_TXT:
-                                r = d[key]
-                                if isinstance(r, float) and r == round(r):
-                                    r = int(r)
-                                elif isinstance(r, float) and r != round(r, 2):
-                                    r = f'{r:.2f}'
-                                annotation.update(
-                                    pdfrw.PdfDict(V=f'{r}')
-                                )
+                        field_type = annotation[ANNOT_FIELD_TYPE_KEY]
+                        field = index.setdefault(key, dict(type=field_type, widgets=[], names=[]))
+                        name = full_name(annotation)
+                        if name not in field['names']:
+                            field['names'].append(name)
+                        on = None
+                        if field_type == ANNOT_FIELD_TYPE_BTN and annotation['/AP'] and annotation['/AP']['/N']:
+                            on = next(iter(annotation['/AP']['/N']))
+                        field['widgets'].append((page, position, number, on))
+                        number += 1
+    return index
+
+
+def load_template_index(file, template):
+    # persisted next to the blank form, rebuilt when the form changed
+    index_file = os.path.splitext(file)[0] + index_extension
+    with open(file, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    if os.path.isfile(index_file):
+        with open(index_file) as f:
+            saved = json.load(f)
+        if saved.get('version') == template_index_version and saved['sha256'] == digest:
+            return saved['fields']
+    index = build_template_index(template)
+    try:
+        with open(index_file + ".tmp", 'w') as f:
+            json.dump(dict(version=template_index_version, sha256=digest, fields=index), f)
+        os.replace(index_file + ".tmp", index_file)
+        logger.info("Index created %s", index_file)
+    except OSError as e:
+        logger.warning("Index not saved %s -- %s", index_file, e)
+    return json.loads(json.dumps(index))  # same as loaded from the file, tuples as lists
+
+
+class TemplateCache:
+    # blank forms parsed once per process, least recently used ones are dropped past max_size
+    # get returns an independent copy that can be filled and written, about 4 times cheaper than parsing again
+    def __init__(self, max_size=template_cache_size):
+        self.max_size = max_size
+        self.templates = OrderedDict()  # path -> ((mtime, size), PdfReader, index)
+
+    def entry(self, file):
+        path = os.path.abspath(file)
+        stat = os.stat(path)
+        version = stat.st_mtime_ns, stat.st_size
+        cached = self.templates.get(path)
+        if cached is None or cached[0] != version:
+            template = pdfrw.PdfReader(path)
+            cached = version, template, load_template_index(path, template)
+            self.templates[path] = cached
+            if len(self.templates) > self.max_size:
+                self.templates.popitem(last=False)
+        self.templates.move_to_end(path)
+        return cached
+
+    def get(self, file):
+        # copy of the parsed form and its field index
+        _, template, index = self.entry(file)
+        memo = {}
+        trailer = copy_pdf_object(template, memo)
+        trailer.private.pages = [copy_pdf_object(page, memo) for page in template.pages]
+        return trailer, index
+
+    def index(self, file):
+        return self.entry(file)[2]
+
+    def clear(self):
+        self.templates.clear()
+
+
+template_cache = TemplateCache()
+
+
+def field_text(r):
+    # value of a text field: whole floats without decimals, others with 2 decimals
+    if isinstance(r, float) and r == round(r):
+        r = int(r)
+    elif isinstance(r, float) and r != round(r, 2):
+        r = f'{r:.2f}'
+    return f'{r}'
+
+
+def fill_widget(annotation, field_type, on, r):
+    if field_type == ANNOT_FIELD_TYPE_BTN:
+        if r:
+            annotation.update(pdfrw.PdfDict(AS=pdfrw.PdfName(on[1:])))  # '/1' -> name
+        else:
+            annotation.update(pdfrw.PdfDict(AS='Off'))
+    elif field_type == ANNOT_FIELD_TYPE_TXT:
+        annotation.update(
+            pdfrw.PdfDict(V=field_text(r))
+        )
+
+
+def fill_annotations(pages, index, d):
+    # d is the dictionary mapping the annotation fields to values
+    # only the widgets of the fields in d are visited, through the index of the form
+    for key, r in d.items():
+        field = index.get(key)
+        if field is None:
+            continue
+        for page, position, _, on in field['widgets']:
+            fill_widget(pages[page][ANNOT_KEY][position], field['type'], on, r)
+
+
+def fill_pdf(file, d, flatten=False):
+    # filled copy of the form, in memory
+    # file is the pdf file
+    # flatten draws the values in the pages and removes the fields, see forms_flatten
+    template_pdf, index = template_cache.get(file)
+    fill_annotations(template_pdf.pages, index, d)
+    if flatten:
+        flatten_pdf(template_pdf)
+    return template_pdf
+
+
+def clone_field(field, memo, root):
+    # copy of the field and of its parents up to root, parents are copied once per memo and get new kids
+    if id(field) in memo:
+        return memo[id(field)]
+    new = pdfrw.PdfDict(field)
+    memo[id(field)] = new
+    if field.Kids is not None:
+        new.Kids = pdfrw.PdfArray()
+    parent = field.Parent
+    new_parent = root if parent is None else clone_field(parent, memo, root)
+    new.Parent = new_parent
+    new_parent.Kids.append(new)
+    return new
+
+
+def fill_pdf_pages(file, d_list, flatten=False):
+    # one document with the pages of the form once per dictionary of d_list (f8949 with 14 trades per copy)
+    # the fields of copy i are under a root field <form>_<i> so their names are unique,
+    # page contents, fonts and appearance streams are shared by the copies instead of written once per file
+    template_pdf, index = template_cache.get(file)
+    name = os.path.splitext(os.path.basename(file))[0]
+    acro_form = pdfrw.PdfDict(template_pdf.Root.AcroForm)
+    acro_form.XFA = None  # describes the blank form only
+    acro_form.Fields = pdfrw.PdfArray()
+
+    pages = []
+    for i, d in enumerate(d_list):
+        root = pdfrw.IndirectPdfDict(T=pdfrw.PdfString.encode(f"{name}_{i}"), Kids=pdfrw.PdfArray())
+        acro_form.Fields.append(root)
+        memo = {}
+        copy_pages = []
+        for page in template_pdf.pages:
+            new_page = pdfrw.PdfDict(page)
+            if page[ANNOT_KEY] is not None:
+                annotations = pdfrw.PdfArray()
+                for annotation in page[ANNOT_KEY]:
+                    if annotation[SUBTYPE_KEY] == WIDGET_SUBTYPE_KEY:
+                        new = clone_field(annotation, memo, root)
+                    else:
+                        new = pdfrw.PdfDict(annotation)
+                    if new.P is not None:
+                        new.P = new_page
+                    annotations.append(new)
+                new_page.Annots = annotations
+            copy_pages.append(new_page)
+        fill_annotations(copy_pages, index, d)
+        pages.extend(copy_pages)
+
+    pages_node = pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Pages, Kids=pdfrw.PdfArray(pages), Count=len(pages))
+    for page in pages:
+        page.Parent = pages_node
+    trailer = pdfrw.PdfDict(Root=pdfrw.IndirectPdfDict(Type=pdfrw.PdfName.Catalog, Pages=pages_node,
+                                                       AcroForm=acro_form))
+    trailer.private.pages = pages
+    if flatten:
+        flatten_pdf(trailer)
+    return trailer
+
+
+class ResourcePool:
+    # identical resources of different documents (fonts, font programs, appearance streams) are kept once
+    # objects are keyed by their content, children first, so equal subtrees end up as the same object
+    # whether an object is indirect is part of the key, not its number in the source file (it differs between forms)
+    def __init__(self):
+        self.canonical = {}  # content key -> object
+        self.seen = {}  # id -> (object, its canonical object)
+        self.visiting = set()
+
+    def intern(self, obj):
+        if not isinstance(obj, (pdfrw.PdfDict, pdfrw.PdfArray)):
+            return obj
+        if id(obj) in self.seen:
+            return self.seen[id(obj)][1]
+        if id(obj) in self.visiting:  # cycle, kept as is
+            return obj
+        self.visiting.add(id(obj))
+        if isinstance(obj, pdfrw.PdfDict):
+            items = []
+            for k, v in obj.iteritems():
+                if k in ('/Parent', '/P'):  # links back to the document, not part of the resource
+                    items.append((k, ('id', id(v))))
+                    continue
+                new_v = self.intern(v)
+                if new_v is not v:
+                    dict.__setitem__(obj, k, new_v)
+                items.append((k, self.content_key(new_v)))
+            key = ('dict', bool(obj.indirect), obj.stream, tuple(sorted(items)))
+        else:
+            values = [self.intern(v) for v in obj]
+            list.__setitem__(obj, slice(None), values)
+            key = ('array', bool(obj.indirect), tuple(self.content_key(v) for v in values))
+        self.visiting.discard(id(obj))
+        canonical = self.canonical.setdefault(key, obj)
+        self.seen[id(obj)] = obj, canonical
+        return canonical
+
+    @staticmethod
+    def content_key(value):
+        if isinstance(value, (pdfrw.PdfDict, pdfrw.PdfArray)):
+            return 'id', id(value)
+        return type(value).__name__, str(value)
+
+
+def merge_forms(documents):
+    # documents is a list of (name, pdf) with pdf a PdfReader or a filled form
+    # one AcroForm for all the fields: top level fields whose name is already taken (every IRS form has
+    # topmostSubform[0]) are put under a root field with the name of the document, so each field keeps its value
+    # returns the writer, to write once all the documents are added
+    writer = pdfrw.PdfWriter()
+    pool = ResourcePool()
+    fields = pdfrw.PdfArray()
+    field_names = set()
+    default_resources = pdfrw.PdfDict()
+    default_appearance = None
+    for name, document in documents:
+        acro_form = document.Root.AcroForm
+        if acro_form is not None and acro_form.Fields:
+            top_fields = list(acro_form.Fields)
+            taken = [f for f in top_fields if f.T is None or f.T.decode() in field_names]
+            if taken:
+                root_name = name
+                i = 1
+                while root_name in field_names:
+                    root_name = f"{name}_{i}"
+                    i += 1
+                root = pdfrw.IndirectPdfDict(T=pdfrw.PdfString.encode(root_name), Kids=pdfrw.PdfArray(taken))
+                for f in taken:
+                    f.Parent = root
+                top_fields = [f for f in top_fields if not any(f is t for t in taken)] + [root]
+            for f in top_fields:
+                field_names.add(f.T.decode())
+                fields.append(f)
+            if acro_form.DR is not None:
+                for category, resources in acro_form.DR.iteritems():
+                    merged = default_resources[category]
+                    if merged is None:
+                        merged = default_resources[category] = pdfrw.PdfDict()
+                    if isinstance(resources, pdfrw.PdfDict):
+                        for k, v in resources.iteritems():
+                            if merged[k] is None:
+                                merged[k] = pool.intern(v)
+            default_appearance = default_appearance or acro_form.DA
+
+        for page in document.pages:
+            if page.Resources is not None:
+                page.Resources = pool.intern(page.Resources)
+            for annotation in page[ANNOT_KEY] or []:
+                if annotation.AP is not None:
+                    annotation.AP = pool.intern(annotation.AP)
+            writer.addpage(page)
+
+    if fields:
+        writer.trailer.Root.AcroForm = pdfrw.IndirectPdfDict(
+            Fields=fields, DR=default_resources or None, DA=default_appearance)
+    return writer
+
+
+def write_pdf(out_file, pdf):
     try:
-        pdfrw.PdfWriter().write(out_file, template_pdf)
+        pdfrw.PdfWriter().write(out_file, pdf)
         logger.info("Exporting PDF file %s succeeded", out_file)
     except OSError as e:
         logger.error("File must be open %s -- %s", out_file, e)
+
+
+def fill_pdf_incremental(file, out_file, d):
+    # the blank form followed by the filled widgets only, see forms_incremental
+    # widgets are filled on shallow copies, the parsed form of the cache is not copied
+    _, template, index = template_cache.entry(file)
+    widgets = {}
+    for key, r in d.items():
+        field = index.get(key)
+        if field is None:
+            continue
+        for page, position, _, on in field['widgets']:
+            annotation = template.pages[page][ANNOT_KEY][position]
+            if not isinstance(annotation.indirect, tuple):  # inside the page, the page would have to be written
+                logger.warning("Widget %s of %s is not an object, writing the whole file", key, file)
+                return write_pdf(out_file, fill_pdf(file, d))
+            widget = widgets.setdefault(annotation.indirect, pdfrw.PdfDict(annotation))
+            fill_widget(widget, field['type'], on, r)
+    try:
+        write_incremental(file, out_file, template, widgets.values())
+        logger.info("Exporting PDF file %s succeeded", out_file)
+    except OSError as e:
+        logger.error("File must be open %s -- %s", out_file, e)
+
+
+def fill_pdf_from_keys(file, out_file, d, flatten=False, incremental=False):
+    # incremental appends the filled widgets to the blank form instead of writing the whole form, not with flatten
+    if incremental and not flatten:
+        fill_pdf_incremental(file, out_file, d)
+    else:
+        write_pdf(out_file, fill_pdf(file, d, flatten))